@@ -0,0 +1,97 @@
+import numpy as np
+
+from chromosome import gene_diversity, random_genes
+from lander import FlyState
+
+LANDED = "landed"
+SAFE = "safe"
+CONVERGED = "converged"
+
+MAX_LANDING_H_SPEED = 20
+MAX_LANDING_V_SPEED = 40
+
+
+def is_safe_landing(lander):
+    """
+    Check a landing against the rules of the game: vertical, slow enough when it touches the landing zone
+    The speed of the last move is the one of the state before the last
+    """
+    if lander.status is not FlyState.Landed:
+        return False
+    trajectory = lander.trajectory
+    speed = trajectory[-2].speed
+    return (trajectory[-1].angle == 0 and
+            abs(speed.x) <= MAX_LANDING_H_SPEED and abs(speed.y) <= MAX_LANDING_V_SPEED)
+
+
+class AdaptiveController:
+    """
+    Watch the fitness and the diversity of a population after every generation
+    When the best fitness stalls, the mutation rate is raised, when the diversity collapses, random immigrants
+    replace the least fit landers. The run is over once a landing is found or nothing improves for `patience`
+    generations
+    """
+
+    def __init__(self, stall_generations=10, rate_growth=1.5, max_rate=0.3, min_diversity=0.01,
+                 immigrant_fraction=0.1, patience=100, min_improvement=1e-3, stop_on=LANDED):
+        """
+        :param stall_generations: generations without improvement before the mutation rate is raised
+        :param rate_growth: factor applied to the mutation rate at every stall, back to its base on improvement
+        :param max_rate: highest mutation rate
+        :param min_diversity: gene_diversity under which immigrants are brought in
+        :param immigrant_fraction: share of the population replaced by immigrants
+        :param patience: generations without improvement before the run is converged, None to never converge
+        :param min_improvement: relative rise of the best fitness counted as an improvement
+        :param stop_on: LANDED to stop on the first landing in the landing zone, SAFE to wait for a landing
+                        within the speed and angle rules of the game, None to never stop on a landing
+        """
+        self.stall_generations = stall_generations
+        self.rate_growth = rate_growth
+        self.max_rate = max_rate
+        self.min_diversity = min_diversity
+        self.immigrant_fraction = immigrant_fraction
+        self.patience = patience
+        self.min_improvement = min_improvement
+        self.stop_on = stop_on
+        self.base_rate = None
+        self.best_fitness = None
+        self.stalled = 0  # generations since the last improvement
+        self.diversity = None
+        self.immigrants = 0  # immigrants brought in so far
+        self.result = None  # LANDED or CONVERGED once the run is over
+
+    def update(self, population):
+        """
+        Adapt the population after a generation
+        :param population: the Population, its mutation rate is changed and immigrants are added in place
+        :return: None while the run goes on, LANDED or CONVERGED when it is over
+        """
+        if self.base_rate is None:
+            self.base_rate = population.mutation_rate
+        max_fitness, _, _, _ = population.evaluate_pop_fitness()
+        genes = np.stack([lander.chromosome.genes for lander in population.population])
+        self.diversity = gene_diversity(genes)
+
+        landed = [lander for lander in population.population if lander.status is FlyState.Landed]
+        if self.stop_on == LANDED and landed or self.stop_on == SAFE and any(map(is_safe_landing, landed)):
+            self.result = LANDED
+            return self.result
+
+        if self.best_fitness is None or max_fitness > self.best_fitness * (1 + self.min_improvement):
+            self.best_fitness = max_fitness
+            self.stalled = 0
+            population.mutation_rate = self.base_rate
+        else:
+            self.stalled += 1
+            if self.patience is not None and self.stalled >= self.patience:
+                self.result = CONVERGED
+                return self.result
+            if self.stalled % self.stall_generations == 0:
+                population.mutation_rate = min(population.mutation_rate * self.rate_growth, self.max_rate)
+
+        if self.diversity < self.min_diversity:
+            count = max(1, int(self.immigrant_fraction * population.population_size))
+            init_state = population.INIT_STATE
+            population.immigrate(random_genes(count, population.CHROMOSOME_SIZE, (init_state.angle, init_state.power)))
+            self.immigrants += count
+        return None
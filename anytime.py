@@ -0,0 +1,177 @@
+import argparse
+import sys
+import time
+
+import numpy as np
+
+from chromosome import CMD_TUPLE, random_genes, reach_from, shift_genes
+from lander import Lander, State
+from main import MAX_LIFECYCLE, MUTATION_RATE, POPULATION_SIZE, ground_inputs_to_line, parse_state
+from plane import Vector
+from population import Population
+
+TURN_TIME = 0.1  # seconds the game gives for a turn
+FIRST_TURN_TIME = 1.0
+SAFETY_MARGIN = 0.01  # seconds kept to write the command
+SMOOTHING = 0.2  # weight of the last generation in the estimated generation time
+
+
+class AnytimeSolver:
+    """
+    Real-time controller evolving a Population under a deadline
+    Every chromosome holds the commands of the next turns, the first gene is the command of the coming turn
+    Once a command is committed, the chromosomes are shifted by one gene, the evolved plans carry over to the next turn
+    """
+
+    def __init__(self, ground_points, init_state, pop_size=POPULATION_SIZE, horizon=MAX_LIFECYCLE,
+                 mutation_rate=MUTATION_RATE, safety_margin=SAFETY_MARGIN, **population_options):
+        """
+        :param ground_points: the ground points, or a Terrain
+        :param init_state: the State of the lander at the first turn
+        :param horizon: number of turns planned ahead, the size of the chromosomes
+        :param safety_margin: seconds before the deadline when no generation is started anymore
+        :param population_options: other keyword arguments of Population
+        """
+        self.safety_margin = safety_margin
+        self.state = init_state
+        self.generation_time = 0.0  # running estimate of the duration of a generation
+        self.generations = 0  # generations evolved during the last turn
+        self.latencies = []  # seconds spent by every call to think
+        self.population = Population(mutation_rate=mutation_rate,
+                                     pop_size=pop_size,
+                                     init_state=init_state,
+                                     ground_points=ground_points,
+                                     max_lifecycle=horizon,
+                                     **population_options)
+        self.best = self.population.best_landers()[0]
+
+    def think(self, deadline):
+        """
+        Evolve the population until the deadline
+        A generation is only started when the estimated generation time still fits before the deadline
+        :param deadline: time.perf_counter() value when the command is due
+        :return: the command of the best lander for the coming turn, a CMD_TUPLE
+        """
+        start = time.perf_counter()
+        self.generations = 0
+        while True:
+            generation_start = time.perf_counter()
+            if generation_start + self.generation_time + self.safety_margin > deadline:
+                break
+            self.population.selection()
+            self.population.reproduction()
+            elapsed = time.perf_counter() - generation_start
+            self.generation_time = (elapsed if self.generation_time == 0.0 else
+                                    (1 - SMOOTHING) * self.generation_time + SMOOTHING * elapsed)
+            self.generations += 1
+        self.best = self.population.best_landers()[0]
+        self.latencies.append(time.perf_counter() - start)
+        return self.command()
+
+    def command(self):
+        """
+        :return: the first command of the best lander
+        """
+        angle, power = self.best.chromosome.genes[0].tolist()
+        return CMD_TUPLE(angle, power)
+
+    def genes(self):
+        return np.stack([lander.chromosome.genes for lander in self.population.population])
+
+    def advance(self, command=None):
+        """
+        Roll the horizon after a turn: drop the first gene of every chromosome and fly them again from the state
+        the committed command leads to
+        :param command: the CMD_TUPLE sent to the game, the best command by default
+        """
+        command = command or self.command()
+        self.state = Lander.compute_next_state(self.state, command)
+        genes = shift_genes(self.genes())
+        reach_from(genes, command)
+        self.population.restart(self.state, genes)
+
+    def observe(self, observed):
+        """
+        Re-sync the simulation with the state the game reports
+        Nothing is flown again when the prediction was right
+        The game reports no acceleration, the simulated one is kept
+        :param observed: the observed State
+        """
+        state = self.state
+        if (observed.position.x, observed.position.y, observed.speed.x, observed.speed.y,
+                observed.fuel, observed.angle, observed.power) == (
+                state.position.x, state.position.y, state.speed.x, state.speed.y,
+                state.fuel, state.angle, state.power):
+            return
+        self.state = State(fuel=observed.fuel,
+                           power=observed.power,
+                           angle=observed.angle,
+                           speed=Vector(observed.speed.x, observed.speed.y),
+                           position=Vector(observed.position.x, observed.position.y),
+                           acceleration=state.acceleration)
+        genes = self.genes()
+        reach_from(genes, (observed.angle, observed.power))
+        self.population.restart(self.state, genes)
+
+    def reset(self, init_state):
+        """
+        Start over from a state with random chromosomes
+        """
+        self.state = init_state
+        genes = np.ascontiguousarray(random_genes(self.population.population_size, Population.CHROMOSOME_SIZE + 1,
+                                                  (init_state.angle, init_state.power))[:, 1:])
+        reach_from(genes, (init_state.angle, init_state.power))
+        self.population.restart(init_state, genes)
+        self.best = self.population.best_landers()[0]
+
+
+def game_loop(input_stream=sys.stdin, output_stream=sys.stdout, turn_time=TURN_TIME,
+              first_turn_time=FIRST_TURN_TIME, **solver_options):
+    """
+    Play the game over text streams: read the ground, then every turn read the state and write "rotate power"
+    The clock of a turn starts when its input line is read
+    :param solver_options: keyword arguments of AnytimeSolver
+    :return: the AnytimeSolver, once the input ends
+    """
+    surface_n = int(input_stream.readline())
+    ground_points = ground_inputs_to_line([input_stream.readline() for _ in range(surface_n)])
+    solver = None
+    for line in input_stream:
+        if not line.strip():
+            continue
+        turn_start = time.perf_counter()
+        observed = parse_state(line)
+        if solver is None:
+            solver = AnytimeSolver(ground_points, observed, **solver_options)
+            solver.reset(observed)
+            deadline = turn_start + first_turn_time
+        else:
+            solver.observe(observed)
+            deadline = turn_start + turn_time
+        command = solver.think(deadline)
+        output_stream.write(f"{command.angle} {command.power}\n")
+        output_stream.flush()
+        solver.advance(command)
+    return solver
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Play the Mars Lander game over stdin and stdout")
+    parser.add_argument("--turn-time", type=float, default=TURN_TIME, help="seconds per turn")
+    parser.add_argument("--first-turn-time", type=float, default=FIRST_TURN_TIME, help="seconds for the first turn")
+    parser.add_argument("--population", type=int, default=POPULATION_SIZE)
+    parser.add_argument("--horizon", type=int, default=MAX_LIFECYCLE, help="turns planned ahead")
+    args = parser.parse_args()
+
+    solver = game_loop(turn_time=args.turn_time,
+                       first_turn_time=args.first_turn_time,
+                       pop_size=args.population,
+                       horizon=args.horizon)
+    if solver and solver.latencies:
+        latencies = np.array(solver.latencies)
+        print(f"turns: {len(latencies)}, latency mean {latencies.mean() * 1000:.1f} ms, "
+              f"max {latencies.max() * 1000:.1f} ms", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,276 @@
+import numpy as np
+
+from lander import FlyState, GRAVITY, MAX_X, MIN_X, PRUNE_INTERVAL, State, compute_fitness, doomed, doomed_penalty
+from plane import MAX_ANGLE, MIN_ANGLE, ROTATIONS, Vector
+from profiling import NULL_PROFILER
+from terrain import Terrain
+
+# Thrust direction for every integer angle a chromosome can produce, indexed by angle + 90
+ANGLE_OFFSET = -MIN_ANGLE
+SIN_TABLE = np.array([ROTATIONS[angle][1] for angle in range(MIN_ANGLE, MAX_ANGLE + 1)])
+COS_TABLE = np.array([ROTATIONS[angle][0] for angle in range(MIN_ANGLE, MAX_ANGLE + 1)])
+
+
+class BatchResult:
+    """
+    Outcome of a batch simulation, one row per lander
+    States are kept as arrays; lengths[i] is the number of states in the trajectory of lander i
+    and status[i] is the value of its FlyState
+    penalty[i] is the part of distance[i] added because the flight was pruned, None when it was not kept
+    """
+
+    def __init__(self, init_state, positions, speeds, accelerations, fuel, angles, powers,
+                 lengths, status, hit_mark, distance, fitness, penalty=None):
+        self.init_state = init_state
+        self.positions = positions
+        self.speeds = speeds
+        self.accelerations = accelerations
+        self.fuel = fuel
+        self.angles = angles
+        self.powers = powers
+        self.lengths = lengths
+        self.status = status
+        self.hit_mark = hit_mark
+        self.distance = distance
+        self.fitness = fitness
+        self.penalty = penalty
+
+    def __len__(self):
+        return len(self.lengths)
+
+    def has_trajectories(self):
+        return self.positions is not None
+
+    def compact(self):
+        """
+        :return: a copy holding only the per-lander scores, without the trajectory arrays
+        """
+        return BatchResult(init_state=self.init_state,
+                           positions=None,
+                           speeds=None,
+                           accelerations=None,
+                           fuel=None,
+                           angles=None,
+                           powers=None,
+                           lengths=self.lengths,
+                           status=self.status,
+                           hit_mark=self.hit_mark,
+                           distance=self.distance,
+                           fitness=self.fitness,
+                           penalty=self.penalty)
+
+    @classmethod
+    def concatenate(cls, results):
+        """
+        Join the results of consecutive batches into one
+        :param results: a non-empty list of BatchResult, all with or all without trajectories
+        :return: the joined BatchResult
+        """
+        def join(name):
+            arrays = [getattr(result, name) for result in results]
+            return None if arrays[0] is None else np.concatenate(arrays)
+
+        return BatchResult(init_state=results[0].init_state,
+                           positions=join("positions"),
+                           speeds=join("speeds"),
+                           accelerations=join("accelerations"),
+                           fuel=join("fuel"),
+                           angles=join("angles"),
+                           powers=join("powers"),
+                           lengths=join("lengths"),
+                           status=join("status"),
+                           hit_mark=join("hit_mark"),
+                           distance=join("distance"),
+                           fitness=join("fitness"),
+                           penalty=join("penalty"))
+
+    def trajectory(self, index):
+        """
+        Rebuild the trajectory of one lander as a list of State objects
+        :param index: the row of the lander in the batch
+        :return: the same list the scalar Lander.compute_trajectory produces
+        """
+        trajectory = [self.init_state]
+        for t in range(1, int(self.lengths[index])):
+            position = self.positions[index, t]
+            speed = self.speeds[index, t]
+            acceleration = self.accelerations[index, t]
+            trajectory.append(State(fuel=int(self.fuel[index, t]),
+                                    power=int(self.powers[index, t]),
+                                    angle=int(self.angles[index, t]),
+                                    speed=Vector(int(speed[0]), int(speed[1])),
+                                    position=Vector(int(position[0]), int(position[1])),
+                                    acceleration=Vector(float(acceleration[0]), float(acceleration[1]))))
+        return trajectory
+
+
+class BatchSimulator:
+    """
+    Physics engine advancing a whole population of landers together
+    Reproduces Lander.compute_trajectory tick for tick with array math
+    """
+
+    def __init__(self, init_state, ground, max_lifecycle, profiler=NULL_PROFILER, prune=False):
+        """
+        :param ground: a Terrain, or a list of ground points to index
+        :param profiler: times the collision, pruning and fitness phases
+        :param prune: stop the landers as soon as the landing zone is out of reach, like the prune of a Lander
+        """
+        self.profiler = profiler
+        self.prune = prune
+        self.init_state = init_state
+        self.ground = Terrain.of(ground)
+        self.max_lifecycle = max_lifecycle
+        self.landing_zone_index = self.ground.landing_zone_index
+
+    @classmethod
+    def stack_genes(cls, chromosomes):
+        """
+        Stack the genes of several chromosomes into one (pop_size, chromosome_size, 2) array
+        :param chromosomes: a list of chromosomes of the same size
+        :return: gene matrix of (angle, power) commands
+        """
+        return np.stack([chromosome.genes for chromosome in chromosomes])
+
+    def simulate(self, genes, checkpoints=None):
+        """
+        Fly every chromosome of the batch until it lands, crashes or runs out of commands
+        :param genes: (pop_size, chromosome_size, 2) array of (angle, power) commands
+        :param checkpoints: optional list with, for each row, None or (parent_result, parent_row, diverge_index):
+                            the row shares its first diverge_index genes with that row of a previous BatchResult,
+                            so its flight starts from the parent state at that tick
+        :return: a BatchResult
+        """
+        genes = np.asarray(genes, dtype=np.int64)
+        pop_size = genes.shape[0]
+        ticks = min(genes.shape[1], self.max_lifecycle + 1)
+        init = self.init_state
+
+        positions = np.zeros((pop_size, ticks + 1, 2))
+        speeds = np.zeros((pop_size, ticks + 1, 2))
+        accelerations = np.zeros((pop_size, ticks + 1, 2))
+        fuel = np.zeros((pop_size, ticks + 1), dtype=np.int64)
+        angles = np.zeros((pop_size, ticks + 1), dtype=np.int64)
+        powers = np.zeros((pop_size, ticks + 1), dtype=np.int64)
+        positions[:, 0] = init.position.x, init.position.y
+        speeds[:, 0] = init.speed.x, init.speed.y
+        accelerations[:, 0] = init.acceleration.x, init.acceleration.y
+        fuel[:, 0] = init.fuel
+        angles[:, 0] = init.angle
+        powers[:, 0] = init.power
+
+        lengths = np.ones(pop_size, dtype=np.int64)
+        status = np.full(pop_size, FlyState.Flying.value, dtype=np.int64)
+        hit_mark = np.full(pop_size, -1, dtype=np.int64)
+        penalty = np.zeros(pop_size)
+        starts = np.zeros(pop_size, dtype=np.int64)
+        if checkpoints is not None:
+            arrays = (positions, speeds, accelerations, fuel, angles, powers)
+            for row, checkpoint in enumerate(checkpoints):
+                if checkpoint is None:
+                    continue
+                parent, parent_row, diverge_index = checkpoint
+                parent_arrays = (parent.positions, parent.speeds, parent.accelerations,
+                                 parent.fuel, parent.angles, parent.powers)
+                parent_length = int(parent.lengths[parent_row])
+                if diverge_index > parent_length - 2:
+                    # the parent stopped before the genes differ, the flight is the same
+                    copied = parent_length
+                    status[row] = parent.status[parent_row]
+                    hit_mark[row] = parent.hit_mark[parent_row]
+                    if parent.penalty is not None:
+                        penalty[row] = parent.penalty[parent_row]
+                    starts[row] = ticks
+                else:
+                    copied = diverge_index + 1
+                    starts[row] = diverge_index
+                lengths[row] = copied
+                for array, parent_array in zip(arrays, parent_arrays):
+                    array[row, :copied] = parent_array[parent_row, :copied]
+        active = np.nonzero(starts == 0)[0]
+        # rows joining the flight after the first tick, by starting tick
+        joining = {t: np.nonzero(starts == t)[0] for t in np.unique(starts[(starts > 0) & (starts < ticks)])}
+        last_start = max(joining) if joining else 0
+
+        for t in range(ticks):
+            if t in joining:
+                active = np.concatenate((active, joining[t]))
+            if active.size == 0:
+                if t >= last_start:
+                    break
+                continue
+            angle = genes[active, t, 0]
+            power = genes[active, t, 1]
+            thrust_x = -(power * SIN_TABLE[angle + ANGLE_OFFSET])
+            thrust_y = power * COS_TABLE[angle + ANGLE_OFFSET]
+
+            position = positions[active, t]
+            speed = speeds[active, t]
+            acceleration = accelerations[active, t]
+            next_position = np.round(position + speed)
+            positions[active, t + 1] = next_position
+            speeds[active, t + 1] = np.round(speed + acceleration)
+            accelerations[active, t + 1, 0] = (acceleration[:, 0] + thrust_x) + GRAVITY.x
+            accelerations[active, t + 1, 1] = (acceleration[:, 1] + thrust_y) + GRAVITY.y
+            fuel[active, t + 1] = fuel[active, t] - power
+            angles[active, t + 1] = angle
+            powers[active, t + 1] = power
+            lengths[active] += 1
+
+            # outside the frame
+            outside = (next_position[:, 0] > MAX_X) | (next_position[:, 0] < MIN_X)
+            status[active[outside]] = FlyState.Crashed.value
+
+            # hit the ground, only checked for the landers not clearly above it
+            with self.profiler.phase("collision"):
+                inside = ~outside
+                checked = active[inside]
+                ax, ay = position[inside, 0].astype(np.int64), position[inside, 1].astype(np.int64)
+                bx, by = next_position[inside, 0].astype(np.int64), next_position[inside, 1].astype(np.int64)
+                codes, hit_mark[checked] = self.ground.crossings(ax, ay, bx, by)
+                hit = codes != 2
+                status[checked[hit]] = np.where(codes[hit] == 0, FlyState.Landed.value, FlyState.Crashed.value)
+
+            # out of fuel
+            no_fuel = ~hit & (fuel[checked, t + 1] <= 0)
+            status[checked[no_fuel]] = FlyState.Crashed.value
+
+            active = checked[~hit & ~no_fuel]
+
+            # out of reach of the landing zone, scored as a crash on the ground under the lander, further away by
+            # doomed_penalty so that pruning never raises the fitness
+            if self.prune and (t + 1) % PRUNE_INTERVAL == 0 and active.size:
+                with self.profiler.phase("pruning"):
+                    position = positions[active, t + 1]
+                    speed = speeds[active, t + 1]
+                    acceleration = accelerations[active, t + 1]
+                    hopeless = doomed(self.ground, position[:, 0], position[:, 1], speed[:, 0], speed[:, 1],
+                                      acceleration[:, 0], acceleration[:, 1], ticks - t - 1)
+                    if hopeless.any():
+                        pruned = active[hopeless]
+                        status[pruned] = FlyState.Crashed.value
+                        hit_mark[pruned] = self.ground.ground_below(position[hopeless, 0], position[hopeless, 1])
+                        penalty[pruned] = doomed_penalty(self.ground, position[hopeless, 1], speed[hopeless, 1],
+                                                         acceleration[hopeless, 1], ticks - t - 1)
+                        active = active[~hopeless]
+
+        with self.profiler.phase("fitness"):
+            rows = np.arange(pop_size)
+            before_last = positions[rows, lengths - 2]
+            distance = self.ground.distances_to_landing(hit_mark, before_last[:, 0], before_last[:, 1]) + penalty
+            fitness = np.array([compute_fitness(distance[i], FlyState(code))
+                                for i, code in enumerate(status.tolist())])
+
+        return BatchResult(init_state=init,
+                           positions=positions,
+                           speeds=speeds,
+                           accelerations=accelerations,
+                           fuel=fuel,
+                           angles=angles,
+                           powers=powers,
+                           lengths=lengths,
+                           status=status,
+                           hit_mark=hit_mark,
+                           distance=distance,
+                           fitness=fitness,
+                           penalty=penalty)
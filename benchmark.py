@@ -0,0 +1,179 @@
+import argparse
+import json
+import platform
+import random
+import time
+
+import numpy as np
+
+from chromosome import Chromosome
+from lander import Lander
+from main import MAPS, MUTATION_RATE, parse_map
+from plane import Vector, segments_intersect
+from population import Population
+from terrain import Terrain, first_crossings
+
+SEED = 7
+POPULATION_SIZES = (50, 200)
+LIFECYCLES = (50, 100)
+GENERATIONS = 5
+MIN_TIME = 0.2  # seconds spent on every micro benchmark
+
+
+def seed(value=SEED):
+    random.seed(value)
+    np.random.seed(value)
+
+
+def calls_per_second(function, arguments, min_time=MIN_TIME):
+    """
+    Call a function over a list of arguments, again and again for at least min_time seconds
+    :param function: the function to time
+    :param arguments: a list of argument tuples
+    :return: calls per second
+    """
+    calls = 0
+    start = time.perf_counter()
+    while True:
+        for args in arguments:
+            function(*args)
+        calls += len(arguments)
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            return calls / elapsed
+
+
+def sample_flights(map_index, lifecycle, count=50):
+    """
+    Fly random chromosomes on a map
+    :return: the ground points and the landers, with their trajectories
+    """
+    seed()
+    ground_points, init_state = parse_map(MAPS[map_index])
+    terrain = Terrain(ground_points)
+    landers = [Lander(init_state, Chromosome(lifecycle), terrain, lifecycle) for _ in range(count)]
+    return ground_points, landers
+
+
+def bench_next_state(map_index, lifecycle):
+    _, landers = sample_flights(map_index, lifecycle)
+    arguments = []
+    for lander in landers:
+        commands = lander.chromosome.commands()
+        for i, state in enumerate(lander.trajectory[:-1]):
+            arguments.append((state, commands[i]))
+    return calls_per_second(Lander.compute_next_state, arguments)
+
+
+def bench_intersection(map_index, lifecycle):
+    ground_points, landers = sample_flights(map_index, lifecycle)
+    steps = []
+    for lander in landers:
+        trajectory = lander.trajectory
+        for i in range(1, len(trajectory)):
+            steps.append((trajectory[i - 1].position, trajectory[i].position))
+    landing_zone_index = Terrain(ground_points).landing_zone_index
+    do_intersect = [(a, b, ground_points[i - 1], ground_points[i])
+                    for a, b in steps for i in range(1, len(ground_points))]
+    crossing = [(a, b, ground_points, landing_zone_index) for a, b in steps]
+    integer = [(a.x, a.y, b.x, b.y, c.x, c.y, d.x, d.y) for a, b, c, d in do_intersect]
+    ends = np.array([(a.x, a.y, b.x, b.y) for a, b in steps], dtype=np.int64).T
+    terrain = Terrain(ground_points)
+    # one call checks every step of the sample, counted as that many segments
+    batched = len(steps) * calls_per_second(first_crossings, [(*ends, terrain.xs, terrain.ys)])
+    return {"do_intersect": calls_per_second(Vector.do_intersect, do_intersect),
+            "segments_intersect": calls_per_second(segments_intersect, integer),
+            "is_line_crossing_other": calls_per_second(Vector.is_line_crossing_other, crossing),
+            "first_crossings": batched}
+
+
+def bench_chromosome(lifecycle):
+    seed()
+    parents = [(Chromosome(lifecycle), Chromosome(lifecycle)) for _ in range(50)]
+    return {"init": calls_per_second(Chromosome, [(lifecycle,)] * 50),
+            "cross_over": calls_per_second(Chromosome.cross_over, parents),
+            "mutate": calls_per_second(Chromosome.mutate, [(mom, MUTATION_RATE) for mom, _ in parents])}
+
+
+def bench_generations(map_index, pop_size, lifecycle, vectorized, generations=GENERATIONS):
+    """
+    :return: generations (selection plus reproduction) per second
+    """
+    seed()
+    ground_points, init_state = parse_map(MAPS[map_index])
+    population = Population(mutation_rate=MUTATION_RATE,
+                            pop_size=pop_size,
+                            init_state=init_state,
+                            ground_points=ground_points,
+                            max_lifecycle=lifecycle,
+                            vectorized=vectorized)
+    start = time.perf_counter()
+    for _ in range(generations):
+        population.selection()
+        population.reproduction()
+    elapsed = time.perf_counter() - start
+    population.close()
+    return generations / elapsed
+
+
+def run_benchmarks(maps=None, pop_sizes=POPULATION_SIZES, lifecycles=LIFECYCLES, generations=GENERATIONS):
+    """
+    Run every benchmark with fixed seeds
+    :return: a dict of benchmark name to rate, in calls (or generations) per second
+    """
+    maps = range(len(MAPS)) if maps is None else maps
+    results = {}
+    for lifecycle in lifecycles:
+        for name, rate in bench_chromosome(lifecycle).items():
+            results[f"chromosome.{name}/life{lifecycle}"] = rate
+        for map_index in maps:
+            key = f"map{map_index}/life{lifecycle}"
+            results[f"lander.compute_next_state/{key}"] = bench_next_state(map_index, lifecycle)
+            for name, rate in bench_intersection(map_index, lifecycle).items():
+                results[f"vector.{name}/{key}"] = rate
+            for pop_size in pop_sizes:
+                for vectorized in (False, True):
+                    mode = "vectorized" if vectorized else "scalar"
+                    results[f"population.generation.{mode}/{key}/pop{pop_size}"] = bench_generations(
+                        map_index, pop_size, lifecycle, vectorized, generations)
+    return results
+
+
+def compare(results, baseline):
+    """
+    Compare rates against a baseline
+    :return: a dict of benchmark name to speedup (current / baseline), for the benchmarks in both
+    """
+    return {name: results[name] / baseline[name] for name in results if baseline.get(name)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the simulation, evaluation and generation throughput")
+    parser.add_argument("--output", default="benchmark.json", help="where to write the results as JSON")
+    parser.add_argument("--baseline", help="a previous results file to compare against")
+    parser.add_argument("--quick", action="store_true", help="only the first map and the smallest sizes")
+    args = parser.parse_args()
+
+    if args.quick:
+        results = run_benchmarks(maps=[0], pop_sizes=POPULATION_SIZES[:1], lifecycles=LIFECYCLES[:1], generations=2)
+    else:
+        results = run_benchmarks()
+    report = {"python": platform.python_version(), "numpy": np.__version__, "seed": SEED, "results": results}
+
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)["results"]
+        report["speedup"] = compare(results, baseline)
+
+    with open(args.output, "w") as output_file:
+        json.dump(report, output_file, indent=2, sort_keys=True)
+
+    for name in sorted(results):
+        line = f"{name:70s} {results[name]:14.1f}/s"
+        if "speedup" in report and name in report["speedup"]:
+            line += f"  x{report['speedup'][name]:.2f}"
+        print(line)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+import os
+import tempfile
+from collections import OrderedDict
+from hashlib import blake2b
+
+import numpy as np
+
+from chromosome import GENE_DTYPE
+from terrain import Terrain
+
+
+class CachedFitness:
+    """
+    Scores of an evaluated chromosome
+    penalty is the part of the distance added because the flight was pruned
+    """
+
+    def __init__(self, fitness, status, hit_mark, distance, penalty=0.0):
+        self.fitness = fitness
+        self.status = status
+        self.hit_mark = hit_mark
+        self.distance = distance
+        self.penalty = penalty
+
+
+class FitnessCache:
+    """
+    Bounded LRU cache of the scores of chromosomes, keyed by a hash of their genes
+    Converged populations breed many identical children, they are only flown once
+    """
+
+    def __init__(self, capacity=10000):
+        """
+        :param capacity: number of chromosomes remembered, the least recently used are forgotten first
+        """
+        self.capacity = capacity
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    @classmethod
+    def key(cls, genes):
+        return blake2b(np.ascontiguousarray(genes, dtype=GENE_DTYPE).tobytes(), digest_size=16).digest()
+
+    def get(self, genes):
+        """
+        :param genes: (size, 2) genes of a chromosome
+        :return: the CachedFitness of the genes, or None
+        """
+        key = self.key(genes)
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def put(self, genes, lander):
+        """
+        Remember the scores of a flown lander
+        :param genes: (size, 2) genes of its chromosome
+        :param lander: the Lander
+        """
+        key = self.key(genes)
+        self.entries[key] = CachedFitness(lander.fitness, lander.status, lander.hit_mark, lander.distance,
+                                          lander.penalty)
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.capacity:
+            self.entries.popitem(last=False)
+
+    def clear(self):
+        self.entries.clear()
+
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+class TerrainCache:
+    """
+    Preprocessed terrains saved on disk, keyed by Terrain.map_hash
+    Regression runs over many maps only preprocess each ground once, across runs and processes
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.hits = 0
+        self.misses = 0
+
+    def path(self, map_hash):
+        return os.path.join(self.directory, f"{map_hash}.npz")
+
+    def get(self, points):
+        """
+        :param points: the ground points
+        :return: the Terrain of the points, loaded from the cache or preprocessed and saved
+        """
+        path = self.path(Terrain.map_hash(points))
+        if os.path.exists(path):
+            self.hits += 1
+            return Terrain.load(path, points)
+        self.misses += 1
+        terrain = Terrain(points)
+        # write aside then rename, other processes never read a partial file
+        descriptor, temporary_path = tempfile.mkstemp(suffix=".npz", dir=self.directory)
+        try:
+            with os.fdopen(descriptor, "wb") as temporary_file:
+                terrain.save(temporary_file)
+            os.replace(temporary_path, path)
+        except BaseException:
+            os.remove(temporary_path)
+            raise
+        return terrain
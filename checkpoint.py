@@ -0,0 +1,214 @@
+import json
+import os
+import struct
+import tempfile
+from queue import Empty, Full, Queue
+from threading import Thread
+
+import numpy as np
+
+from chromosome import GENE_DTYPE
+from lander import State
+from plane import Vector
+
+MAGIC = b"MLGACKPT"
+VERSION = 1
+ALIGNMENT = 64  # byte alignment of every array in the file
+
+
+class Checkpoint:
+    """
+    State of a Population at the end of a generation: gene matrix, fitness, generation count,
+    numpy RNG state, settings, initial state and ground
+    Written as a fixed-layout binary file: magic, header length, JSON header, then the raw arrays,
+    which are memory-mapped back on read
+    """
+
+    def __init__(self, generation, genes, fitness, config, init_state, ground, rng_state):
+        """
+        :param genes: (pop_size, size, 2) gene matrix
+        :param fitness: (pop_size,) fitness of the landers, in the order of the genes
+        :param config: dict of the Population settings: mutation_rate, pop_size, max_lifecycle, elitism
+        :param ground: (n, 2) array of the ground points
+        :param rng_state: the tuple of np.random.get_state()
+        """
+        self.generation = generation
+        self.genes = genes
+        self.fitness = fitness
+        self.config = config
+        self.init_state = init_state
+        self.ground = ground
+        self.rng_state = rng_state
+
+    @classmethod
+    def of(cls, population):
+        """
+        Copy the state of a population, it can then be written while the population evolves
+        :return: the Checkpoint
+        """
+        landers = population.population
+        return cls(generation=population.generation_count,
+                   genes=np.stack([lander.chromosome.genes for lander in landers]),
+                   fitness=np.array([lander.fitness for lander in landers]),
+                   config={"mutation_rate": population.mutation_rate,
+                           "pop_size": population.population_size,
+                           "max_lifecycle": population.MAX_LIFECYCLE,
+                           "elitism": population.elitism},
+                   init_state=population.INIT_STATE,
+                   ground=np.array([(point.x, point.y) for point in population.ground_points], dtype=np.int64),
+                   rng_state=np.random.get_state())
+
+    def ground_points(self):
+        return [Vector(int(x), int(y)) for x, y in self.ground]
+
+    def write(self, path):
+        """
+        Write the checkpoint next to path, then rename it, a crash never leaves a partial file behind
+        """
+        name, keys, position, has_gauss, cached_gaussian = self.rng_state
+        state = self.init_state
+        arrays = {"genes": np.ascontiguousarray(self.genes, dtype=GENE_DTYPE),
+                  "fitness": np.ascontiguousarray(self.fitness, dtype=np.float64),
+                  "ground": np.ascontiguousarray(self.ground, dtype=np.int64),
+                  "rng_keys": np.ascontiguousarray(keys, dtype=np.uint32)}
+        header = {"version": VERSION,
+                  "generation": self.generation,
+                  "config": self.config,
+                  "init_state": {"fuel": state.fuel, "power": state.power, "angle": state.angle,
+                                 "speed": [state.speed.x, state.speed.y],
+                                 "position": [state.position.x, state.position.y],
+                                 "acceleration": [state.acceleration.x, state.acceleration.y]},
+                  "rng": {"name": name, "position": int(position), "has_gauss": int(has_gauss),
+                          "cached_gaussian": float(cached_gaussian)},
+                  "arrays": {}}
+        # offsets depend on the header length, grow it until they stop moving
+        offsets_length = 0
+        while True:
+            offset = len(MAGIC) + 8 + offsets_length
+            for array_name, array in arrays.items():
+                offset += -offset % ALIGNMENT
+                header["arrays"][array_name] = {"dtype": array.dtype.str, "shape": list(array.shape),
+                                                "offset": offset}
+                offset += array.nbytes
+            encoded = json.dumps(header).encode()
+            if len(encoded) <= offsets_length:
+                break
+            offsets_length = len(encoded) + 64
+        encoded = encoded.ljust(offsets_length)
+
+        directory = os.path.dirname(os.path.abspath(path))
+        descriptor, temporary_path = tempfile.mkstemp(suffix=".tmp", dir=directory)
+        try:
+            with os.fdopen(descriptor, "wb") as checkpoint_file:
+                checkpoint_file.write(MAGIC)
+                checkpoint_file.write(struct.pack("<Q", len(encoded)))
+                checkpoint_file.write(encoded)
+                for array_name, array in arrays.items():
+                    checkpoint_file.seek(header["arrays"][array_name]["offset"])
+                    checkpoint_file.write(array.tobytes())
+            os.replace(temporary_path, path)
+        except BaseException:
+            os.remove(temporary_path)
+            raise
+
+    @classmethod
+    def read(cls, path):
+        """
+        :param path: a file written by Checkpoint.write
+        :return: the Checkpoint, its arrays memory-mapped copy-on-write
+        """
+        with open(path, "rb") as checkpoint_file:
+            if checkpoint_file.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{path} is not a population checkpoint")
+            header_length, = struct.unpack("<Q", checkpoint_file.read(8))
+            header = json.loads(checkpoint_file.read(header_length))
+        if header["version"] != VERSION:
+            raise ValueError(f"Unsupported checkpoint version {header['version']}, expected {VERSION}")
+        arrays = {}
+        for name, layout in header["arrays"].items():
+            shape = tuple(layout["shape"])
+            if 0 in shape:
+                arrays[name] = np.zeros(shape, dtype=layout["dtype"])
+            else:
+                arrays[name] = np.memmap(path, dtype=layout["dtype"], mode="c", offset=layout["offset"], shape=shape)
+        state = header["init_state"]
+        init_state = State(fuel=state["fuel"],
+                           power=state["power"],
+                           angle=state["angle"],
+                           speed=Vector(*state["speed"]),
+                           position=Vector(*state["position"]),
+                           acceleration=Vector(*state["acceleration"]))
+        rng = header["rng"]
+        rng_state = (rng["name"], np.array(arrays["rng_keys"]), rng["position"], rng["has_gauss"],
+                     rng["cached_gaussian"])
+        return cls(generation=header["generation"],
+                   genes=arrays["genes"],
+                   fitness=arrays["fitness"],
+                   config=header["config"],
+                   init_state=init_state,
+                   ground=arrays["ground"],
+                   rng_state=rng_state)
+
+
+def write_loop(path, checkpoints):
+    """
+    Write the checkpoints of the queue until None is received
+    """
+    while True:
+        checkpoint = checkpoints.get()
+        if checkpoint is None:
+            return
+        checkpoint.write(path)
+
+
+class CheckpointWriter:
+    """
+    Periodic checkpoints of a Population, written by a background thread
+    The state is copied at the end of the generation, only the file writing happens in the background
+    When a write is still pending, it is replaced by the newer checkpoint
+    """
+
+    def __init__(self, path, interval=10, asynchronous=True):
+        """
+        :param path: the checkpoint file, overwritten by every checkpoint
+        :param interval: write every interval generations
+        :param asynchronous: write in a background thread, otherwise before evolution goes on
+        """
+        self.path = path
+        self.interval = max(1, interval)
+        self.skipped = 0  # checkpoints replaced by newer ones before they were written
+        self.checkpoints = Queue(maxsize=1) if asynchronous else None
+        self.worker = None
+        if asynchronous:
+            self.worker = Thread(target=write_loop, args=(path, self.checkpoints), daemon=True)
+            self.worker.start()
+
+    def end_generation(self, population):
+        """
+        Checkpoint the population if its generation count is due
+        """
+        if population.generation_count % self.interval == 0:
+            self.submit(Checkpoint.of(population))
+
+    def submit(self, checkpoint):
+        if self.checkpoints is None:
+            checkpoint.write(self.path)
+            return
+        try:
+            self.checkpoints.put_nowait(checkpoint)
+        except Full:
+            try:
+                self.checkpoints.get_nowait()
+                self.skipped += 1
+            except Empty:
+                pass
+            self.checkpoints.put(checkpoint)
+
+    def close(self):
+        """
+        Wait for the pending checkpoint to be written
+        """
+        if self.worker:
+            self.checkpoints.put(None)
+            self.worker.join()
+            self.worker = None
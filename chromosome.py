@@ -1,8 +1,15 @@
 from collections import namedtuple
-import random
+
+import numpy as np
 
 CMD_TUPLE = namedtuple("Command", ["angle", "power"])
 
+GENE_DTYPE = np.int16
+ANGLE, POWER = 0, 1
+MIN_ANGLE, MAX_ANGLE = -90, 90
+MIN_ANGLE_CHANGE, MAX_ANGLE_CHANGE = -15, 16
+MIN_POWER_CHANGE, MAX_POWER_CHANGE = -1, 2
+
 
 def coerce_range(value, min_value, max_value):
     """
@@ -19,23 +26,143 @@ def coerce_range(value, min_value, max_value):
     return value
 
 
+def random_steps(shape):
+    """
+    Draw the random (angle, power) steps of the command random walk
+    :param shape: leading shape of the steps
+    :return: int array of shape + (2,)
+    """
+    steps = np.empty(shape + (2,), dtype=GENE_DTYPE)
+    steps[..., ANGLE] = np.random.randint(MIN_ANGLE_CHANGE, MAX_ANGLE_CHANGE + 1, size=shape)
+    steps[..., POWER] = np.random.randint(MIN_POWER_CHANGE, MAX_POWER_CHANGE + 1, size=shape)
+    return steps
+
+
+def random_genes(count, size, start=(0, 0)):
+    """
+    Create the genes of several random chromosomes at once
+    Each chromosome is a random walk starting from start, clipped to the valid range at every step
+    :param count: number of chromosomes
+    :param size: number of genes per chromosome
+    :param start: (angle, power) of the first gene
+    :return: (count, size, 2) gene matrix
+    """
+    steps = random_steps((count, size))
+    genes = np.zeros((count, size, 2), dtype=GENE_DTYPE)
+    genes[:, 0] = start
+    lower = np.array([MIN_ANGLE, 0], dtype=GENE_DTYPE)
+    upper = np.array([MAX_ANGLE, Chromosome.MAX_THRUST_VALUE], dtype=GENE_DTYPE)
+    for i in range(1, size):
+        np.clip(genes[:, i - 1] + steps[:, i], lower, upper, out=genes[:, i])
+    return genes
+
+
+def cross_over_genes(mothers, fathers, weights):
+    """
+    Arithmetic crossover of two gene matrices, pair by pair
+    The first gene is blended too, parents sharing the (0, 0) init values pass them on
+    :param mothers: (n, size, 2) gene matrix
+    :param fathers: (n, size, 2) gene matrix
+    :param weights: (n,) weight of the mother in the first child
+    :return: two (n, size, 2) gene matrices of children
+    """
+    weights = np.asarray(weights, dtype=np.float64).reshape(-1, 1, 1)
+    weights_comp = 1 - weights
+    children0 = (mothers * weights + fathers * weights_comp).astype(GENE_DTYPE)
+    children1 = (mothers * weights_comp + fathers * weights).astype(GENE_DTYPE)
+    return children0, children1
+
+
+def mutate_genes(genes, mutation_rate):
+    """
+    Mutate a gene matrix in place
+    Each gene is redrawn with probability mutation_rate as one random walk step from the gene before it
+    The first gene has none before it and is never mutated
+    :param genes: (n, size, 2) gene matrix
+    :param mutation_rate: normally within [0 - 0.05]
+    """
+    mask = np.random.random(genes.shape[:2]) < mutation_rate
+    mask[:, 0] = False
+    if not mask.any():
+        return
+    previous = np.roll(genes, 1, axis=1)[mask]
+    steps = random_steps(previous.shape[:1])
+    mutated = previous + steps
+    np.clip(mutated[:, ANGLE], MIN_ANGLE, MAX_ANGLE, out=mutated[:, ANGLE])
+    np.clip(mutated[:, POWER], 0, Chromosome.MAX_THRUST_VALUE, out=mutated[:, POWER])
+    genes[mask] = mutated
+
+
+def shift_genes(genes):
+    """
+    Drop the first gene of every chromosome and draw a new last gene, one random walk step after the one before it
+    :param genes: (n, size, 2) gene matrix
+    :return: the shifted (n, size, 2) gene matrix
+    """
+    shifted = np.empty_like(genes)
+    shifted[:, :-1] = genes[:, 1:]
+    shifted[:, -1] = genes[:, -1] + random_steps(genes.shape[:1])
+    np.clip(shifted[:, -1, ANGLE], MIN_ANGLE, MAX_ANGLE, out=shifted[:, -1, ANGLE])
+    np.clip(shifted[:, -1, POWER], 0, Chromosome.MAX_THRUST_VALUE, out=shifted[:, -1, POWER])
+    return shifted
+
+
+def reach_from(genes, command):
+    """
+    Clip the first gene of every chromosome in place to the commands a turn of the game can reach
+    :param genes: (n, size, 2) gene matrix
+    :param command: the (angle, power) in effect before the first gene
+    """
+    angle, power = command
+    # the game turns by 15 degrees and changes the power by 1 at most per turn
+    np.clip(genes[:, 0, ANGLE], max(angle + MIN_ANGLE_CHANGE, MIN_ANGLE), min(angle - MIN_ANGLE_CHANGE, MAX_ANGLE),
+            out=genes[:, 0, ANGLE])
+    np.clip(genes[:, 0, POWER], max(power + MIN_POWER_CHANGE, 0),
+            min(power - MIN_POWER_CHANGE, Chromosome.MAX_THRUST_VALUE), out=genes[:, 0, POWER])
+
+
+def first_differences(genes, others):
+    """
+    Index of the first gene where each chromosome differs from another one
+    :param genes: (n, size, 2) gene matrix
+    :param others: (n, size, 2) gene matrix to compare with, row by row
+    :return: (n,) array of indices, size where the chromosomes are identical
+    """
+    different = (genes != others).any(axis=2)
+    return np.where(different.any(axis=1), different.argmax(axis=1), genes.shape[1])
+
+
+def gene_diversity(genes):
+    """
+    Spread of a population: standard deviation of every gene across the chromosomes,
+    as a fraction of the range of angles and powers, averaged over the genes
+    :param genes: (n, size, 2) gene matrix
+    :return: 0 when every chromosome is the same
+    """
+    spread = np.std(genes, axis=0).mean(axis=0)
+    return float((spread[0] / (MAX_ANGLE - MIN_ANGLE) + spread[1] / Chromosome.MAX_THRUST_VALUE) / 2)
+
+
 class Chromosome:
     MAX_THRUST_VALUE = 4
     MAX_THRUST_CHANGE = 2
 
-    def __init__(self, size):
-        self.genes = []
+    def __init__(self, size, genes=None):
+        """
+        :param size: number of genes
+        :param genes: optional (size, 2) array of (angle, power), a random walk is drawn otherwise
+        """
         self.gene_size = size
-        self.genes.append(CMD_TUPLE(0, 0))  # Init values
+        self.genes = random_genes(1, size)[0] if genes is None else genes
+        # the Lander of the parent sharing the longest prefix of genes, until this chromosome is flown
+        self.parent = None
+        self.diverge_index = 0  # first gene differing from the parent
 
-        for i in range(1, self.gene_size):
-            angle = coerce_range(
-                self.genes[i - 1].angle + random.randint(-15, 16),
-                -90, 90)
-            power = coerce_range(
-                self.genes[i - 1].power + random.randint(-1, 2),
-                0, Chromosome.MAX_THRUST_VALUE)
-            self.genes.append(CMD_TUPLE(angle, power))
+    def commands(self):
+        """
+        :return: the genes as a list of CMD_TUPLE(angle, power)
+        """
+        return [CMD_TUPLE(angle, power) for angle, power in self.genes.tolist()]
 
     def cross_over(self, partner):
         """
@@ -43,32 +170,12 @@ class Chromosome:
         :param partner: the partner chromosome
         :return: two children chromosomes
         """
-        weight = random.random()
-        weight_comp = 1 - weight
-        child1 = Chromosome(len(self.genes))
-        child2 = Chromosome(len(self.genes))
-
-        for i in range(1, len(self.genes)):
-            w_angle = int(self.genes[i].angle * weight + partner.genes[i].angle * weight_comp)
-            w_power = int(self.genes[i].power * weight + partner.genes[i].power * weight_comp)
-            child1.genes[i] = CMD_TUPLE(w_angle, w_power)
-
-            w_angle = int(self.genes[i].angle * weight_comp + partner.genes[i].angle * weight)
-            w_power = int(self.genes[i].power * weight_comp + partner.genes[i].power * weight)
-            child2.genes[i] = CMD_TUPLE(w_angle, w_power)
-        return child1, child2
+        children0, children1 = cross_over_genes(self.genes[None], partner.genes[None], np.random.random())
+        return Chromosome(self.gene_size, children0[0]), Chromosome(self.gene_size, children1[0])
 
     def mutate(self, mutation_rate):
         """
         Mutate the chromosome under the mutation rate
         :param mutation_rate: normally within [0 - 0.05]
         """
-        for i in range(len(self.genes)):
-            if random.random() < mutation_rate:
-                new_angle = coerce_range(
-                    self.genes[i - 1].angle + random.randint(-15, 16),
-                    -90, 90)
-                new_power = coerce_range(
-                    self.genes[i - 1].power + random.randint(-1, 2),
-                    0, Chromosome.MAX_THRUST_VALUE)
-                self.genes[i] = (CMD_TUPLE(new_angle, new_power))
+        mutate_genes(self.genes[None], mutation_rate)
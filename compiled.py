@@ -0,0 +1,219 @@
+import math
+
+import numpy as np
+
+from batch import ANGLE_OFFSET, COS_TABLE, SIN_TABLE, BatchResult
+from lander import (FlyState, GRAVITY, HORIZONTAL_JERK, MAX_X, MIN_X, PRUNE_INTERVAL, ROUNDING, VERTICAL_JERK,
+                    compute_fitness, doomed_penalty)
+from plane import segments_intersect
+from profiling import NULL_PROFILER
+from terrain import Terrain
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+FLYING = FlyState.Flying.value
+LANDED = FlyState.Landed.value
+CRASHED = FlyState.Crashed.value
+GRAVITY_X = GRAVITY.x
+GRAVITY_Y = GRAVITY.y
+
+
+def jit(function):
+    """
+    Compile a function with numba when it is installed, keep the Python function otherwise
+    """
+    if numba is None:
+        return function
+    return numba.njit(cache=True)(function)
+
+
+intersect_kernel = jit(segments_intersect)
+
+
+def first_crossing(ax, ay, bx, by, ground_x, ground_y):
+    """
+    Vector.is_line_crossing_other on coordinates, the lines out of the bounding box of ab are skipped
+    :return: index of the first crossed ground line, or -1
+    """
+    for i in range(ground_x.shape[0] - 1):
+        cx, cy, dx, dy = ground_x[i], ground_y[i], ground_x[i + 1], ground_y[i + 1]
+        if max(ax, bx) < min(cx, dx) or min(ax, bx) > max(cx, dx):
+            continue
+        if max(ay, by) < min(cy, dy) or min(ay, by) > max(cy, dy):
+            continue
+        if intersect_kernel(ax, ay, bx, by, cx, cy, dx, dy):
+            return i
+    return -1
+
+
+first_crossing_kernel = jit(first_crossing)
+
+
+def reach_limit(position, speed, acceleration, jerk, ticks):
+    """
+    lander.reach_bound on plain numbers, with the same operations so that both round alike
+    """
+    a = (acceleration + ROUNDING) / 2
+    b = jerk / 6
+    linear = 2 * a - 6 * b
+    constant = speed + ROUNDING - a + 2 * b
+    discriminant = max(linear * linear - 12 * b * constant, 0.0)
+    local_max = min(max((-linear - math.sqrt(discriminant)) / (6 * b), 0.0), float(ticks))
+    best = position
+    for k in (float(ticks), local_max):
+        value = position + k * (speed + ROUNDING) + a * (k * k - k) + b * (k * k * k - 3 * k * k + 2 * k)
+        if value > best:
+            best = value
+    return best
+
+
+reach_limit_kernel = jit(reach_limit)
+
+
+def fly_rows(genes, init, ground_x, ground_y, landing_zone_index, max_lifecycle, cos_table, sin_table, prune,
+             lengths, status, hit_mark, last_x, last_y, pruned_at, pruned_state):
+    """
+    Lander.compute_fitness_only for every row of a gene matrix, on plain numbers, the results are written in place
+    :param genes: (n, size, 2) int64 gene matrix
+    :param init: x, y, h_speed, v_speed, h_acc, v_acc and fuel of the initial state, as floats
+    :param prune: stop the flights as soon as the landing zone is out of reach, like the prune of a Lander
+    :param lengths: (n,) states in the trajectory of each lander
+    :param status: (n,) value of the final FlyState
+    :param hit_mark: (n,) crossed ground line, or -1
+    :param last_x, last_y: (n,) the last position before the end of the flight
+    :param pruned_at: (n,) tick the flight was pruned at, or -1
+    :param pruned_state: (n, 4) x, y, v_speed and v_acc of the pruned flights when they were pruned
+    """
+    ticks = min(genes.shape[1], max_lifecycle + 1)
+    left = ground_x[landing_zone_index]
+    right = ground_x[landing_zone_index + 1]
+    height = ground_y[landing_zone_index]
+    for row in range(genes.shape[0]):
+        x, y, h_speed, v_speed, h_acc, v_acc, fuel = init[0], init[1], init[2], init[3], init[4], init[5], init[6]
+        previous_x, previous_y = x, y
+        state = FLYING
+        mark = -1
+        length = 1
+        pruned_at[row] = -1
+        for i in range(ticks):
+            angle = genes[row, i, 0]
+            power = genes[row, i, 1]
+            cos_ = cos_table[angle + ANGLE_OFFSET]
+            sin_ = sin_table[angle + ANGLE_OFFSET]
+            previous_x, previous_y = x, y
+            x, y = np.rint(x + h_speed), np.rint(y + v_speed)
+            h_speed, v_speed = np.rint(h_speed + h_acc), np.rint(v_speed + v_acc)
+            h_acc = h_acc + (0.0 * cos_ - power * sin_) + GRAVITY_X
+            v_acc = v_acc + (0.0 * sin_ + power * cos_) + GRAVITY_Y
+            fuel -= power
+            length += 1
+
+            if x > MAX_X or x < MIN_X:
+                state = CRASHED
+                break
+            mark = first_crossing_kernel(previous_x, previous_y, x, y, ground_x, ground_y)
+            if mark >= 0:
+                state = LANDED if mark == landing_zone_index else CRASHED
+                break
+            if fuel <= 0:
+                state = CRASHED
+                break
+            if prune and (i + 1) % PRUNE_INTERVAL == 0:
+                left_ticks = ticks - i - 1
+                if (reach_limit_kernel(x, h_speed, h_acc, HORIZONTAL_JERK, left_ticks) < left or
+                        -reach_limit_kernel(-x, -h_speed, -h_acc, HORIZONTAL_JERK, left_ticks) > right or
+                        (y < height and reach_limit_kernel(y, v_speed, v_acc, VERTICAL_JERK, left_ticks) < height)):
+                    state = CRASHED
+                    pruned_at[row] = i
+                    pruned_state[row, 0] = x
+                    pruned_state[row, 1] = y
+                    pruned_state[row, 2] = v_speed
+                    pruned_state[row, 3] = v_acc
+                    break
+        lengths[row] = length
+        status[row] = state
+        hit_mark[row] = mark
+        last_x[row] = previous_x
+        last_y[row] = previous_y
+
+
+fly_rows_kernel = jit(fly_rows)
+
+
+class CompiledSimulator:
+    """
+    Same interface as BatchSimulator, flying every chromosome in one compiled loop
+    Only the scores are kept, the trajectories are flown again by the Lander when they are read
+    """
+
+    def __init__(self, init_state, ground, max_lifecycle, profiler=NULL_PROFILER, prune=False):
+        """
+        :param ground: a Terrain, or a list of ground points to index
+        :param profiler: times the fitness phase
+        :param prune: stop the landers as soon as the landing zone is out of reach, like the prune of a Lander
+        """
+        self.profiler = profiler
+        self.prune = prune
+        self.init_state = init_state
+        self.ground = Terrain.of(ground)
+        self.max_lifecycle = max_lifecycle
+        self.landing_zone_index = self.ground.landing_zone_index
+
+    @classmethod
+    def available(cls, ground):
+        """
+        :return: True when numba is installed and the map can be flown by the kernel
+        """
+        return numba is not None and Terrain.of(ground).landing_zone_index is not None
+
+    def simulate(self, genes, checkpoints=None):
+        """
+        :param genes: (pop_size, chromosome_size, 2) array of (angle, power) commands
+        :param checkpoints: ignored, every flight starts from the initial state
+        :return: a BatchResult without trajectories
+        """
+        genes = np.ascontiguousarray(genes, dtype=np.int64)
+        state = self.init_state
+        init = np.array([state.position.x, state.position.y, state.speed.x, state.speed.y,
+                         state.acceleration.x, state.acceleration.y, state.fuel], dtype=np.float64)
+        pop_size = len(genes)
+        lengths = np.empty(pop_size, dtype=np.int64)
+        status = np.empty(pop_size, dtype=np.int64)
+        hit_mark = np.empty(pop_size, dtype=np.int64)
+        last_x = np.empty(pop_size)
+        last_y = np.empty(pop_size)
+        pruned_at = np.empty(pop_size, dtype=np.int64)
+        pruned_state = np.empty((pop_size, 4))
+        fly_rows_kernel(genes, init, self.ground.xs, self.ground.ys, self.landing_zone_index, self.max_lifecycle,
+                        COS_TABLE, SIN_TABLE, self.prune, lengths, status, hit_mark, last_x, last_y,
+                        pruned_at, pruned_state)
+
+        with self.profiler.phase("fitness"):
+            # the pruned flights are scored like in BatchSimulator, on the ground under them and further away
+            penalty = np.zeros(pop_size)
+            pruned = pruned_at >= 0
+            if pruned.any():
+                x, y, v_speed, v_acc = pruned_state[pruned].T
+                hit_mark[pruned] = self.ground.ground_below(x, y)
+                ticks = min(genes.shape[1], self.max_lifecycle + 1)
+                penalty[pruned] = doomed_penalty(self.ground, y, v_speed, v_acc, ticks - pruned_at[pruned] - 1)
+            distance = self.ground.distances_to_landing(hit_mark, last_x, last_y) + penalty
+            fitness = np.array([compute_fitness(distance[i], FlyState(code))
+                                for i, code in enumerate(status.tolist())])
+
+        return BatchResult(init_state=self.init_state,
+                           positions=None,
+                           speeds=None,
+                           accelerations=None,
+                           fuel=None,
+                           angles=None,
+                           powers=None,
+                           lengths=lengths,
+                           status=status,
+                           hit_mark=hit_mark,
+                           distance=distance,
+                           fitness=fitness,
+                           penalty=penalty)
@@ -1,4 +1,3 @@
-import turtle
 from plane import Vector
 
 
@@ -13,6 +12,8 @@ class Ground:
         self.is_target = True
 
     def display(self):
+        import turtle
+
         self.x0 = int(self.x0 / 10)
         self.y0 = int(self.y0 / 10)
         self.x1 = int(self.x1 / 10)
@@ -34,6 +35,8 @@ class SimpleTarget:
         self.is_target = True
 
     def display(self):
+        import turtle
+
         self.x0 = int(self.x0 / 10)
         self.y0 = int(self.y0 / 10)
 
@@ -0,0 +1,170 @@
+from collections import OrderedDict
+
+import numpy as np
+
+STATE_DTYPE = np.int32
+
+
+class GenerationRecord:
+    """
+    Trajectories of one saved generation, as arrays
+    Row i holds lengths[i] states of positions (x, y), speeds (h, v) and fuel
+    """
+
+    def __init__(self, generation, positions, speeds, fuel, lengths, fitness):
+        self.generation = generation
+        self.positions = positions
+        self.speeds = speeds
+        self.fuel = fuel
+        self.lengths = lengths
+        self.fitness = fitness
+
+    def __len__(self):
+        return len(self.lengths)
+
+    @classmethod
+    def allocate(cls, rows, width):
+        return cls(generation=None,
+                   positions=np.zeros((rows, width, 2), dtype=STATE_DTYPE),
+                   speeds=np.zeros((rows, width, 2), dtype=STATE_DTYPE),
+                   fuel=np.zeros((rows, width), dtype=STATE_DTYPE),
+                   lengths=np.zeros(rows, dtype=STATE_DTYPE),
+                   fitness=np.zeros(rows))
+
+    def fits(self, rows, width):
+        return self.positions.shape[0] == rows and self.positions.shape[1] >= width
+
+    def fill(self, generation, landers):
+        """
+        Copy the trajectories of the landers into the preallocated arrays
+        """
+        self.generation = generation
+        self.positions[:] = 0
+        self.speeds[:] = 0
+        self.fuel[:] = 0
+        for i, lander in enumerate(landers):
+            positions, speeds, fuel = lander.trajectory_arrays()
+            length = len(fuel)
+            self.positions[i, :length] = positions
+            self.speeds[i, :length] = speeds
+            self.fuel[i, :length] = fuel
+            self.lengths[i] = length
+            self.fitness[i] = lander.fitness
+
+    def trajectories(self):
+        """
+        :return: the positions of every trajectory, one (n, 2) array per lander
+        """
+        return [self.positions[i, :self.lengths[i]] for i in range(len(self))]
+
+
+class TrajectoryHistory:
+    """
+    Bounded store of the trajectories flown by a population, generation after generation
+    retention decides which generations are saved:
+        "none", only the current generation is referenced, nothing is copied
+        "last", the last `keep` generations
+        "every", every `every`-th generation
+        "best", the best lander of every generation
+    At most `keep` saved generations stay in memory. Older ones are dropped,
+    or with spill_path set (and retention other than "last") appended to a file read back memory-mapped
+    """
+    RETENTIONS = ("none", "last", "every", "best")
+
+    def __init__(self, retention="last", keep=1, every=1, spill_path=None):
+        if retention not in TrajectoryHistory.RETENTIONS:
+            raise ValueError(f"Unknown retention {retention}, expected one of {TrajectoryHistory.RETENTIONS}")
+        self.retention = retention
+        self.keep = max(1, keep)
+        self.every = max(1, every)
+        self.spill_path = spill_path
+        self.current_generation = None
+        self.current = []  # landers of the latest generation, referenced only
+        self.records = OrderedDict()  # generation -> GenerationRecord held in memory
+        self.spilled = OrderedDict()  # generation -> (offset, rows, width) in the spill file
+        self.spill_offset = 0
+        self.free = []  # at most keep records evicted from memory, reused for the next generations
+        if spill_path:
+            open(spill_path, "wb").close()
+
+    def is_saved(self, generation):
+        if self.retention == "none":
+            return False
+        if self.retention == "every":
+            return generation % self.every == 0
+        return True
+
+    def record(self, generation, landers):
+        """
+        Register the landers of a new generation
+        :param generation: the generation count
+        :param landers: the landers of the generation
+        """
+        self.current_generation = generation
+        self.current = list(landers)
+        if not self.is_saved(generation):
+            return
+        if self.retention == "best":
+            landers = [max(self.current, key=lambda lander: lander.fitness)]
+        else:
+            landers = self.current
+        width = max(len(lander.trajectory_arrays()[2]) for lander in landers)
+        record = self.take_free_record(len(landers), width)
+        record.fill(generation, landers)
+        self.records[generation] = record
+        while len(self.records) > self.keep:
+            _, evicted = self.records.popitem(last=False)
+            if self.spill_path and self.retention != "last":
+                self.spill(evicted)
+            if len(self.free) < self.keep:
+                self.free.append(evicted)
+
+    def take_free_record(self, rows, width):
+        """
+        Reuse a free record when one fits, the free records too small for the generation are let go
+        """
+        self.free = [record for record in self.free if record.fits(rows, width)]
+        if self.free:
+            return self.free.pop()
+        return GenerationRecord.allocate(rows, width)
+
+    def spill(self, record):
+        """
+        Append a record to the spill file
+        """
+        rows, width = record.positions.shape[:2]
+        with open(self.spill_path, "ab") as spill_file:
+            for array in (record.positions, record.speeds, record.fuel, record.lengths):
+                spill_file.write(np.ascontiguousarray(array, dtype=STATE_DTYPE).tobytes())
+            spill_file.write(np.ascontiguousarray(record.fitness, dtype=np.float64).tobytes())
+        self.spilled[record.generation] = (self.spill_offset, rows, width)
+        self.spill_offset += (rows * width * 5 + rows) * np.dtype(STATE_DTYPE).itemsize + rows * 8
+
+    def generations(self):
+        """
+        :return: the saved generations, in order
+        """
+        return sorted(list(self.spilled) + list(self.records))
+
+    def load(self, generation):
+        """
+        Get a saved generation, memory-mapped from the spill file when it is no longer in memory
+        :param generation: a saved generation
+        :return: a GenerationRecord
+        """
+        if generation in self.records:
+            return self.records[generation]
+        offset, rows, width = self.spilled[generation]
+        itemsize = np.dtype(STATE_DTYPE).itemsize
+        arrays = []
+        for shape in ((rows, width, 2), (rows, width, 2), (rows, width), (rows,)):
+            arrays.append(np.memmap(self.spill_path, dtype=STATE_DTYPE, mode="r", offset=offset, shape=shape))
+            offset += int(np.prod(shape)) * itemsize
+        fitness = np.memmap(self.spill_path, dtype=np.float64, mode="r", offset=offset, shape=(rows,))
+        return GenerationRecord(generation, *arrays, fitness)
+
+    def current_trajectories(self):
+        """
+        :return: the positions of every lander of the current generation, one (n, 2) array per lander
+        """
+        return [lander.trajectory_arrays()[0] for lander in self.current]
@@ -0,0 +1,197 @@
+import time
+from multiprocessing import Pipe, Process, Queue
+from multiprocessing.connection import Client, Listener
+from queue import Empty
+from threading import Thread
+
+import numpy as np
+
+from population import Population
+
+TOPOLOGIES = ("ring", "full")
+
+
+def migration_edges(islands, topology):
+    """
+    :param islands: number of islands
+    :param topology: "ring", every island sends to the next one, or "full", every island sends to all the others
+    :return: list of (sender, receiver) pairs
+    """
+    if topology == "ring":
+        return [(i, (i + 1) % islands) for i in range(islands) if (i + 1) % islands != i]
+    if topology == "full":
+        return [(i, j) for i in range(islands) for j in range(islands) if i != j]
+    raise ValueError(f"Unknown topology {topology}, expected one of {TOPOLOGIES}")
+
+
+class PipeLinks:
+    """
+    Migration links between islands of one host, one pipe per edge, built in the parent process
+    """
+
+    def __init__(self, edges):
+        self.incoming = {}
+        self.outgoing = {}
+        for sender, receiver in edges:
+            receive_end, send_end = Pipe(duplex=False)
+            self.incoming.setdefault(receiver, {})[sender] = receive_end
+            self.outgoing.setdefault(sender, {})[receiver] = send_end
+
+    def open(self, island):
+        """
+        :return: the connections of an island, {sender: connection} and {receiver: connection}
+        """
+        return self.incoming.get(island, {}), self.outgoing.get(island, {})
+
+
+class SocketLinks:
+    """
+    Migration links over sockets, so islands can live on several hosts
+    Every island listens on its own address and connects to the addresses of the islands it sends to
+    """
+
+    def __init__(self, edges, addresses, authkey=b"mars-lander", timeout=30.0):
+        """
+        :param addresses: one (host, port) per island
+        :param timeout: seconds to wait for the other islands to come up
+        """
+        self.edges = edges
+        self.addresses = addresses
+        self.authkey = authkey
+        self.timeout = timeout
+
+    def connect(self, address):
+        deadline = time.monotonic() + self.timeout
+        while True:
+            try:
+                return Client(address, authkey=self.authkey)
+            except ConnectionRefusedError:
+                if time.monotonic() > deadline:
+                    raise
+                time.sleep(0.05)
+
+    def open(self, island):
+        listener = Listener(self.addresses[island], authkey=self.authkey)
+        incoming = {}
+        senders = sum(1 for _, receiver in self.edges if receiver == island)
+
+        def accept():
+            while len(incoming) < senders:
+                connection = listener.accept()
+                incoming[connection.recv()] = connection
+
+        # accept while connecting, the handshake of each side waits for the other
+        acceptor = Thread(target=accept, daemon=True)
+        acceptor.start()
+        outgoing = {}
+        for sender, receiver in self.edges:
+            if sender == island:
+                outgoing[receiver] = self.connect(self.addresses[receiver])
+                outgoing[receiver].send(island)
+        acceptor.join()
+        listener.close()
+        return incoming, outgoing
+
+
+class IslandReport:
+    """
+    Best lander of an island after a generation
+    """
+
+    def __init__(self, island, generation, fitness, status, genes):
+        self.island = island
+        self.generation = generation
+        self.fitness = fitness
+        self.status = status
+        self.genes = genes
+
+
+def run_island(island, links, config, reports):
+    """
+    Evolve one island, exchanging its best landers with its neighbours every config["migration_interval"] generations
+    """
+    np.random.seed(config["seed"] + island)
+    incoming, outgoing = links.open(island)
+    population = Population(mutation_rate=config["mutation_rate"],
+                            pop_size=config["pop_size"],
+                            init_state=config["init_state"],
+                            ground_points=config["ground_points"],
+                            max_lifecycle=config["max_lifecycle"])
+    for generation in range(1, config["generations"] + 1):
+        population.selection()
+        population.reproduction()
+        if outgoing or incoming:
+            if generation % config["migration_interval"] == 0:
+                migrants = np.stack([lander.chromosome.genes
+                                     for lander in population.best_landers(config["migrants"])])
+                # a send blocks once the migrants fill the pipe buffer, so sends run in the background
+                # while this island receives from its neighbours
+                senders = [Thread(target=connection.send, args=(migrants,), daemon=True)
+                           for connection in outgoing.values()]
+                for sender in senders:
+                    sender.start()
+                for connection in incoming.values():
+                    population.immigrate(connection.recv())
+                for sender in senders:
+                    sender.join()
+        best = population.best_landers()[0]
+        reports.put(IslandReport(island, generation, best.fitness, best.status.name, best.chromosome.genes))
+    population.close()
+    reports.put(None)
+
+
+class IslandRunner:
+    """
+    Evolve several populations of the same map in parallel, one process per island
+    Every migration_interval generations, each island sends copies of its best landers to its neighbours,
+    which replace their least fit landers with them
+    """
+
+    def __init__(self, init_state, ground_points, islands=4, topology="ring", migration_interval=10, migrants=5,
+                 mutation_rate=0.08, pop_size=200, max_lifecycle=100, seed=0, addresses=None):
+        """
+        :param addresses: one (host, port) per island to migrate over sockets, pipes are used otherwise
+        """
+        self.islands = islands
+        edges = migration_edges(islands, topology)
+        self.links = SocketLinks(edges, addresses) if addresses else PipeLinks(edges)
+        self.config = {"init_state": init_state,
+                       "ground_points": ground_points,
+                       "migration_interval": migration_interval,
+                       "migrants": migrants,
+                       "mutation_rate": mutation_rate,
+                       "pop_size": pop_size,
+                       "max_lifecycle": max_lifecycle,
+                       "seed": seed}
+        self.best = None
+
+    def run(self, generations, callback=None):
+        """
+        Evolve every island for a number of generations
+        :param generations: generations per island
+        :param callback: called with every IslandReport that improves the global best
+        :return: the IslandReport of the global best
+        """
+        config = dict(self.config, generations=generations)
+        reports = Queue()
+        processes = [Process(target=run_island, args=(island, self.links, config, reports), daemon=True)
+                     for island in range(self.islands)]
+        for process in processes:
+            process.start()
+        running = len(processes)
+        while running:
+            try:
+                report = reports.get(timeout=1.0)
+            except Empty:
+                if not any(process.is_alive() for process in processes):
+                    break
+                continue
+            if report is None:
+                running -= 1
+            elif self.best is None or report.fitness > self.best.fitness:
+                self.best = report
+                if callback:
+                    callback(report)
+        for process in processes:
+            process.join()
+        return self.best
@@ -1,10 +1,34 @@
 import math
-from plane import Vector
 from enum import Enum
 
+import numpy as np
+
+from chromosome import Chromosome
+from plane import Vector, rotation
+from terrain import Terrain
+
 GRAVITY = Vector(0.0, -3.71)
 MAX_X = 6999
 MIN_X = 0
+ROUNDING = 0.5  # largest change of a speed or a position when it is rounded
+HORIZONTAL_JERK = Chromosome.MAX_THRUST_VALUE  # largest change of the horizontal acceleration per tick
+VERTICAL_JERK = Chromosome.MAX_THRUST_VALUE + GRAVITY.y  # largest rise of the vertical acceleration per tick
+FALL_JERK = -GRAVITY.y  # largest drop of the vertical acceleration per tick
+PRUNE_INTERVAL = 4  # ticks between two checks of the reach of the landing zone, the bounds cost more than a tick
+
+
+def physics_step(x, y, h_speed, v_speed, h_acc, v_acc, fuel, angle, power):
+    """
+    One tick of flight on plain numbers, with the same operations as Lander.compute_next_state on Vectors
+    :param angle: the commanded angle, in degree
+    :param power: the commanded thrust
+    :return: the next x, y, h_speed, v_speed, h_acc, v_acc and fuel
+    """
+    cos_, sin_ = rotation(angle)
+    return (round(x + h_speed), round(y + v_speed),
+            round(h_speed + h_acc), round(v_speed + v_acc),
+            h_acc + (0.0 * cos_ - power * sin_) + GRAVITY.x, v_acc + (0.0 * sin_ + power * cos_) + GRAVITY.y,
+            fuel - power)
 
 
 def get_distance(x0, y0, x1, y1):
@@ -12,59 +36,21 @@ def get_distance(x0, y0, x1, y1):
     return distance
 
 
-def get_distance_landing(ground_list,
-                         landing_zone_index,  # 4
-                         landing_index,  # 2
-                         x1,
-                         y1
-                         ):
-    if landing_index > landing_zone_index+1:
-        surface_distance = 0.0
-        for i in range(landing_zone_index+1, landing_index):
-            x0_ = ground_list[i].x
-            y0_ = ground_list[i].y
-            x1_ = ground_list[i + 1].x
-            y1_ = ground_list[i + 1].y
-
-            segment_distance = get_distance(x0=x0_,
-                                            y0=y0_,
-                                            x1=x1_,
-                                            y1=y1_)
-            surface_distance += segment_distance
-        x0 = ground_list[landing_index].x
-        y0 = ground_list[landing_index].y
-        segment_distance = get_distance(x0=x0,
-                                        y0=y0,
-                                        x1=x1,
-                                        y1=y1)
-        surface_distance += segment_distance
-        return surface_distance
-    elif landing_index < landing_zone_index:
-        # left-hand side
-        surface_distance = 0.0
-        for i in range(landing_index + 1,  # 3
-                       landing_zone_index  # 4
-                       ):
-            x0_ = ground_list[i].x
-            y0_ = ground_list[i].y
-            x1_ = ground_list[i + 1].x
-            y1_ = ground_list[i + 1].y
-
-            segment_distance = get_distance(x0=x0_,
-                                            y0=y0_,
-                                            x1=x1_,
-                                            y1=y1_)
-            surface_distance += segment_distance
-        x0 = ground_list[landing_index + 1].x
-        y0 = ground_list[landing_index + 1].y
-        segment_distance = get_distance(x0=x0,
-                                        y0=y0,
-                                        x1=x1,
-                                        y1=y1)
-        surface_distance += segment_distance
-        return surface_distance
-    else:
-        return 0
+def compute_fitness(distance, status):
+    """
+    Score a finished flight from its distance to the landing zone and its final status
+    :param distance: surface distance to the landing zone
+    :param status: final FlyState of the lander
+    :return: the fitness value
+    """
+    if distance < 1:
+        distance = 1
+    fitness = (1 / distance) ** 5
+    if status == FlyState.Crashed:
+        fitness *= 0.1
+    if status == FlyState.Landed:
+        fitness *= 10
+    return fitness
 
 
 def coerce_range(value, min_value, max_value):
@@ -75,7 +61,68 @@ def coerce_range(value, min_value, max_value):
     return value
 
 
+def reach_bound(position, speed, acceleration, jerk, ticks):
+    """
+    Upper bound of one coordinate of a lander over its next ticks, whatever its commands
+    The acceleration rises by at most jerk per tick and speeds and positions gain at most ROUNDING when rounded,
+    so k ticks later the coordinate is at most
+        f(k) = position + k (speed + R) + (acceleration + R) k (k - 1) / 2 + jerk k (k - 1) (k - 2) / 6
+    Works on floats as well as on arrays of landers
+    :param ticks: number of ticks left
+    :return: the maximum of f over [0, ticks]
+    """
+    a = (acceleration + ROUNDING) / 2
+    b = jerk / 6
+
+    def f(k):
+        return position + k * (speed + ROUNDING) + a * (k * k - k) + b * (k * k * k - 3 * k * k + 2 * k)
+
+    # f is a cubic with a positive leading coefficient, its local maximum is the smaller root of f'
+    linear = 2 * a - 6 * b
+    constant = speed + ROUNDING - a + 2 * b
+    discriminant = np.maximum(linear * linear - 12 * b * constant, 0)
+    local_max = np.clip((-linear - np.sqrt(discriminant)) / (6 * b), 0, ticks)
+    return np.maximum(np.maximum(position, f(ticks)), f(local_max))
+
+
+def doomed(terrain, x, y, h_speed, v_speed, h_acc, v_acc, ticks):
+    """
+    Check if a lander can no longer reach the landing zone, with closed-form bounds of its position
+    It is doomed when it stays left or right of the landing zone, or below it, for all its remaining ticks
+    Works on floats as well as on arrays of landers
+    :param terrain: the Terrain of the map
+    :param ticks: number of commands left
+    :return: True where landing is impossible
+    """
+    zone = terrain.landing_zone_index
+    if zone is None:
+        return np.zeros(np.shape(x), dtype=bool)
+    left, right, height = terrain.xs[zone], terrain.xs[zone + 1], terrain.ys[zone]
+    return ((reach_bound(x, h_speed, h_acc, HORIZONTAL_JERK, ticks) < left) |
+            (-reach_bound(-x, -h_speed, -h_acc, HORIZONTAL_JERK, ticks) > right) |
+            ((y < height) & (reach_bound(y, v_speed, v_acc, VERTICAL_JERK, ticks) < height)))
+
+
+def doomed_penalty(terrain, y, v_speed, v_acc, ticks):
+    """
+    Distance added to the score of a pruned flight, so it never scores better than the full flight would
+    The full flight ends at most the longest ground on one side of the landing zone plus the longest way
+    from a position it can still reach to a ground point away from it
+    Works on floats as well as on arrays of landers
+    :param ticks: number of commands left
+    :return: an upper bound of the distance the full flight would score
+    """
+    zone = terrain.landing_zone_index
+    arc_lengths = terrain.arc_lengths
+    longest_side = max(arc_lengths[zone] - arc_lengths[0], arc_lengths[-1] - arc_lengths[zone + 1])
+    high = np.maximum(reach_bound(y, v_speed, v_acc, VERTICAL_JERK, ticks), terrain.ys.max())
+    low = np.minimum(-reach_bound(-y, -v_speed, -v_acc, FALL_JERK, ticks), terrain.ys.min())
+    return longest_side + np.hypot(MAX_X - MIN_X, high - low)
+
+
 class State:
+    __slots__ = ("fuel", "power", "angle", "position", "speed", "acceleration")
+
     def __init__(self, fuel, power, angle, speed, position, acceleration):
         self.fuel = fuel
         self.power = power
@@ -106,32 +153,158 @@ class FlyState(Enum):
 
 
 class Lander:
-    GROUND = None
-    LANDING_ZONE_MARK = None
-    MAX_LIFECYCLE = None
-
-    def __init__(self, init_state, chromosome, ground, max_lifecycle):
-        self.trajectory = [init_state]
+    def __init__(self, init_state, chromosome, ground, max_lifecycle, keep_trajectory=True, parent=None, prune=False):
+        """
+        :param keep_trajectory: store every State of the flight, otherwise only the fitness is computed
+                                and the trajectory is flown again when it is read
+        :param parent: a Lander whose chromosome shares its first chromosome.diverge_index genes with this one,
+                       its stored trajectory is reused up to there instead of being flown again
+        :param prune: stop the flight as soon as the landing zone is out of reach
+        """
+        self.batch_result = None
+        self.batch_index = None
+        self.init_state = init_state
         self.chromosome = chromosome
-        Lander.GROUND = ground
-        Lander.MAX_LIFECYCLE = max_lifecycle
+        # every lander keeps what it was flown with, a trajectory flown again later gives the same flight
+        self.ground = Terrain.of(ground)
+        self.max_lifecycle = max_lifecycle
+        self.prune = prune
         self.landing_zone = []
         self.fitness = 0.0
         self.hit_mark = -1  # mark the hitting point of the Lander
         self.status = FlyState.Flying
-
-        self.compute_trajectory()
-        self.distance = self.calculate_distance()
+        self.penalty = 0.0  # distance added when the flight is pruned
+
+        if keep_trajectory:
+            start = self.resume_from(parent)
+            if start is not None:
+                self.compute_trajectory(start)
+            self.distance = self.calculate_distance()
+        else:
+            self.trajectory = None
+            self.distance = self.compute_fitness_only()
         self.calculate_fitness()
 
-    def compute_trajectory(self):
+    @classmethod
+    def from_batch(cls, chromosome, batch_result, index, ground, max_lifecycle, prune=False):
+        """
+        Create a Lander from one row of a batch simulation instead of flying it again
+        The trajectory is only rebuilt into State objects when it is read
+        :param chromosome: the chromosome simulated at this row
+        :param batch_result: the BatchResult holding the row
+        :param index: the row of the lander in the batch
+        :param prune: whether the batch was flown with pruning
+        :return: the Lander
+        """
+        lander = cls.__new__(cls)
+        lander.batch_result = batch_result
+        lander.batch_index = index
+        lander.init_state = batch_result.init_state
+        lander._trajectory = None
+        lander.chromosome = chromosome
+        lander.ground = Terrain.of(ground)
+        lander.max_lifecycle = max_lifecycle
+        lander.prune = prune
+        lander.landing_zone = []
+        lander.hit_mark = int(batch_result.hit_mark[index])
+        lander.status = FlyState(int(batch_result.status[index]))
+        lander.distance = float(batch_result.distance[index])
+        lander.penalty = 0.0 if batch_result.penalty is None else float(batch_result.penalty[index])
+        lander.fitness = float(batch_result.fitness[index])
+        return lander
+
+    @classmethod
+    def from_scores(cls, chromosome, init_state, ground, max_lifecycle, scores, prune=False):
+        """
+        Create a Lander from known scores instead of flying it
+        The trajectory is flown when it is read
+        :param scores: anything with the fitness, status, hit_mark, distance and penalty of the chromosome
+        :param prune: whether the scores were flown with pruning
+        :return: the Lander
+        """
+        lander = cls.__new__(cls)
+        lander.batch_result = None
+        lander.batch_index = None
+        lander.init_state = init_state
+        lander._trajectory = None
+        lander.chromosome = chromosome
+        lander.ground = Terrain.of(ground)
+        lander.max_lifecycle = max_lifecycle
+        lander.prune = prune
+        lander.landing_zone = []
+        lander.hit_mark = scores.hit_mark
+        lander.status = scores.status
+        lander.distance = scores.distance
+        lander.penalty = scores.penalty
+        lander.fitness = scores.fitness
+        return lander
+
+    @property
+    def trajectory(self):
+        if self._trajectory is None:
+            if self.batch_result is not None and self.batch_result.has_trajectories():
+                self._trajectory = self.batch_result.trajectory(self.batch_index)
+            else:
+                # only the scores were kept, fly the chromosome again, its scores are already known
+                status, hit_mark, penalty = self.status, self.hit_mark, self.penalty
+                self._trajectory = [self.init_state]
+                self.compute_trajectory()
+                self.status, self.hit_mark, self.penalty = status, hit_mark, penalty
+                self.batch_result = None
+        return self._trajectory
+
+    @trajectory.setter
+    def trajectory(self, trajectory):
+        self._trajectory = trajectory
+
+    def trajectory_arrays(self):
+        """
+        The trajectory as arrays, read straight from the batch simulation when there is one
+        :return: positions (n, 2), speeds (n, 2) and fuel (n,) of the n states
+        """
+        result = self.batch_result
+        if result is not None and result.has_trajectories():
+            length = result.lengths[self.batch_index]
+            return (result.positions[self.batch_index, :length],
+                    result.speeds[self.batch_index, :length],
+                    result.fuel[self.batch_index, :length])
+        trajectory = self.trajectory
+        positions = np.array([(state.position.x, state.position.y) for state in trajectory])
+        speeds = np.array([(state.speed.x, state.speed.y) for state in trajectory])
+        fuel = np.array([state.fuel for state in trajectory])
+        return positions, speeds, fuel
+
+    def resume_from(self, parent):
+        """
+        Start the trajectory with the states the parent went through before the chromosomes differ
+        :param parent: a Lander or None
+        :return: the tick to fly from, None when the parent stopped before the chromosomes differ
+        """
+        trajectory = None if parent is None else parent._trajectory
+        if trajectory is None or parent.init_state is not self.init_state or parent.ground is not self.ground:
+            self.trajectory = [self.init_state]
+            return 0
+        diverge_index = self.chromosome.diverge_index
+        if diverge_index > len(trajectory) - 2:
+            # the rest of the genes was never used, the flight is the same
+            self.trajectory = list(trajectory)
+            self.status = parent.status
+            self.hit_mark = parent.hit_mark
+            self.penalty = parent.penalty
+            return None
+        self.trajectory = trajectory[:diverge_index + 1]
+        return diverge_index
+
+    def compute_trajectory(self, start=0):
         """
         compute the whole trajectory for the Lander and connect to the trajectory list
+        :param start: first command to run, the trajectory already holds the states up to it
         """
         # Run the whole life of the chromosome in one cycle
-        commands = self.chromosome.genes
-        for i, cmd in enumerate(commands):
-            if i > Lander.MAX_LIFECYCLE:
+        commands = self.chromosome.commands()
+        ticks = min(len(commands), self.max_lifecycle + 1)
+        for i in range(start, len(commands)):
+            if i > self.max_lifecycle:
                 break
             current_state = self.trajectory[i]
             cmd = commands[i]
@@ -144,35 +317,70 @@ class Lander:
                 break
             if self.evaluate_no_fuel(next_state):
                 break
+            if self.prune and (i + 1) % PRUNE_INTERVAL == 0 and self.evaluate_doomed(next_state, ticks - i - 1):
+                break
         return
 
+    def compute_fitness_only(self):
+        """
+        Fly the chromosome like compute_trajectory, keeping only the current and previous
+        positions, speed, acceleration and fuel as plain numbers
+        :return: the distance to the landing zone
+        """
+        init = self.init_state
+        x, y = init.position.x, init.position.y
+        h_speed, v_speed = init.speed.x, init.speed.y
+        h_acc, v_acc = init.acceleration.x, init.acceleration.y
+        fuel = init.fuel
+        previous_x, previous_y = x, y
+        ticks = min(len(self.chromosome.genes), self.max_lifecycle + 1)
+        for i, (angle, power) in enumerate(self.chromosome.genes.tolist()):
+            if i > self.max_lifecycle:
+                break
+            previous_x, previous_y = x, y
+            x, y, h_speed, v_speed, h_acc, v_acc, fuel = physics_step(x, y, h_speed, v_speed, h_acc, v_acc, fuel,
+                                                                      angle, power)
+
+            if x > MAX_X or x < MIN_X:
+                self.status = FlyState.Crashed
+                break
+            landing_status, self.hit_mark = self.ground.crossing_xy(previous_x, previous_y, x, y)
+            if landing_status == 0:
+                self.status = FlyState.Landed
+                break
+            if landing_status == 1:
+                self.status = FlyState.Crashed
+                break
+            if fuel <= 0:
+                self.status = FlyState.Crashed
+                break
+            if (self.prune and (i + 1) % PRUNE_INTERVAL == 0 and
+                    doomed(self.ground, x, y, h_speed, v_speed, h_acc, v_acc, ticks - i - 1)):
+                self.status = FlyState.Crashed
+                self.hit_mark = int(self.ground.ground_below(x, y))
+                self.penalty = float(doomed_penalty(self.ground, y, v_speed, v_acc, ticks - i - 1))
+                break
+        return self.ground.distance_to_landing(hit_mark=self.hit_mark, x=previous_x, y=previous_y) + self.penalty
+
     @classmethod
     def compute_next_state(cls, current_state, cmd):
-        next_state_angle = cmd.angle
-        next_state_power = cmd.power
-        thrust = Vector(0.0, 1.0).scale(next_state_power).rotate(next_state_angle)
-        next_state_acceleration = current_state.acceleration.add(thrust).add(GRAVITY)
-        next_state_speed = current_state.speed.add(current_state.acceleration).round_up()
-        next_state_position = current_state.position.add(current_state.speed).round_up()
-        next_state_fuel = current_state.fuel - next_state_power
-
-        return State(fuel=next_state_fuel,
-                     power=next_state_power,
-                     angle=next_state_angle,
-                     speed=next_state_speed,
-                     position=next_state_position,
-                     acceleration=next_state_acceleration)
+        position, speed, acceleration = current_state.position, current_state.speed, current_state.acceleration
+        x, y, h_speed, v_speed, h_acc, v_acc, fuel = physics_step(position.x, position.y, speed.x, speed.y,
+                                                                  acceleration.x, acceleration.y,
+                                                                  current_state.fuel, cmd.angle, cmd.power)
+        return State(fuel=fuel,
+                     power=cmd.power,
+                     angle=cmd.angle,
+                     speed=Vector(h_speed, v_speed),
+                     position=Vector(x, y),
+                     acceleration=Vector(h_acc, v_acc))
 
     def evaluate_hit_ground(self, current_state, next_state):
-        Lander.find_landing_zone()
         # Calculate the landing status (next state)
         # 0, for landing in landing zone
         # 1, for crashing on the ground
         # 2, for flying
-        landing_status, self.hit_mark = Vector.is_line_crossing_other(current_state.position,
-                                                                      next_state.position,
-                                                                      Lander.GROUND,
-                                                                      Lander.LANDING_ZONE_MARK)
+        landing_status, self.hit_mark = self.ground.crossing(current_state.position, next_state.position)
 
         if landing_status == 0:  # landing in landing zone
             self.status = FlyState.Landed
@@ -193,6 +401,20 @@ class Lander:
             return True
         return False
 
+    def evaluate_doomed(self, next_state, ticks):
+        """
+        Stop a flight that can no longer reach the landing zone
+        It is scored as a crash on the ground under the lander, further away by doomed_penalty
+        :param ticks: number of commands left
+        """
+        position, speed, acceleration = next_state.position, next_state.speed, next_state.acceleration
+        if doomed(self.ground, position.x, position.y, speed.x, speed.y, acceleration.x, acceleration.y, ticks):
+            self.status = FlyState.Crashed
+            self.hit_mark = int(self.ground.ground_below(position.x, position.y))
+            self.penalty = float(doomed_penalty(self.ground, position.y, speed.y, acceleration.y, ticks))
+            return True
+        return False
+
     def evaluate_outside(self, next_state):
         """
         Evaluate if next state will be outside the frame
@@ -204,41 +426,22 @@ class Lander:
             return True
         return False
 
-    @classmethod
-    def find_landing_zone(cls):
-        """
-        Find the [Left point] of the landing zone (the id)
-        """
-        for i in range(1, len(cls.GROUND)):
-            if cls.GROUND[i - 1].y == cls.GROUND[i].y:
-                cls.LANDING_ZONE_MARK = i - 1
-                return
-
     def calculate_distance(self):
         return self.calculate_distance_landing()
 
     def calculate_distance_landing(self):
-        return get_distance_landing(ground_list=Lander.GROUND,
-                                    landing_zone_index=Lander.LANDING_ZONE_MARK,
-                                    landing_index=self.hit_mark,
-                                    x1=self.trajectory[-2].position.x,
-                                    y1=self.trajectory[-2].position.y)
+        return self.ground.distance_to_landing(hit_mark=self.hit_mark,
+                                               x=self.trajectory[-2].position.x,
+                                               y=self.trajectory[-2].position.y) + self.penalty
 
     def calculate_distance_flying(self):
-        return get_distance(Lander.GROUND[Lander.LANDING_ZONE_MARK].x,
-                            Lander.GROUND[Lander.LANDING_ZONE_MARK].y,
+        return get_distance(self.ground[self.ground.landing_zone_index].x,
+                            self.ground[self.ground.landing_zone_index].y,
                             self.trajectory[-1].position.x,
                             self.trajectory[-1].position.y)
 
     def calculate_fitness(self):
-        distance = self.distance
-        if distance < 1:
-            distance = 1
-        self.fitness = (1 / distance) ** 5
-        if self.status == FlyState.Crashed:
-            self.fitness *= 0.1
-        if self.status == FlyState.Landed:
-            self.fitness *= 10
+        self.fitness = compute_fitness(self.distance, self.status)
 
     def get_chromosome(self):
         return self.chromosome
@@ -1,12 +1,23 @@
+import argparse
+
+from adaptive import AdaptiveController, LANDED
+from checkpoint import CheckpointWriter
 from population import Population
 from plane import Vector
 from lander import State
+from metrics import CallbackSink, JsonlSink
+from renderer import AsyncRenderer
 
 MUTATION_RATE = 0.08
 MAX_LIFECYCLE = 100
 POPULATION_SIZE = 200
+ELITISM = 0.2  # share of the fittest landers kept as they are in the next generation
 REFRESH_RATE = 30
+HEADLESS = False  # evolve without any display, matplotlib and turtle are never imported
 MAP_SELECTION = 1
+WORKERS = None  # number of processes evaluating the landers, None to evaluate in the main process
+PATIENCE = 200  # generations without improvement before the run is converged
+CHECKPOINT_INTERVAL = 50  # generations between two checkpoints, when a checkpoint file is given
 
 
 def ground_inputs_to_line(ground_points):
@@ -16,36 +27,60 @@ def ground_inputs_to_line(ground_points):
     return points
 
 
-def init():
-    input1 = [6,  # number of ground points
-              "0 1500", "1000 2000", "2000 500", "3500 500", "5000 1500", "6999 1000",
-              "5000 2500",  # INIT_X INIT_Y
-              "0 0",  # INIT_DX INIT_DY
-              "0"]  # INIT_ANGLE
-    input2 = [15,  # number of ground points
-              "0 2500", "100 200", "500 150", "1000 2000", "2000 2000", "2010 1500", "2200 800", "2500 200",
-              "6899 300", "6999 2500", "4100 2600", "4200 1500", "3500 1300", "3100 1600", "3400 3400",
-              "6500 1300",  # INIT_X INIT_Y #16
-              "-50 0",  # INIT_DX INIT_DY #17
-              "0"]  # INIT_ANGLE #18
-
-    input3 = [15,  # number of ground points
-              "0 2500", "100 200", "500 150", "1000 2000", "2000 2000", "2010 1500", "2200 800", "2500 200",
-              "6899 300", "6999 2500", "4100 2600", "4200 1000", "3500 800", "3100 1100", "3400 2900",
-              "6500 1300",  # INIT_X INIT_Y #16
-              "0 0",  # INIT_DX INIT_DY #17
-              "0"]  # INIT_ANGLE #18
-
-    input_data_list = list([input1, input2, input3])
-    input_data = input_data_list[MAP_SELECTION]
-    num_ground_points = input_data[0]
+MAPS = [
+    [6,  # number of ground points
+     "0 1500", "1000 2000", "2000 500", "3500 500", "5000 1500", "6999 1000",
+     "5000 2500",  # INIT_X INIT_Y
+     "0 0",  # INIT_DX INIT_DY
+     "0"],  # INIT_ANGLE
+    [15,  # number of ground points
+     "0 2500", "100 200", "500 150", "1000 2000", "2000 2000", "2010 1500", "2200 800", "2500 200",
+     "6899 300", "6999 2500", "4100 2600", "4200 1500", "3500 1300", "3100 1600", "3400 3400",
+     "6500 1300",  # INIT_X INIT_Y #16
+     "-50 0",  # INIT_DX INIT_DY #17
+     "0"],  # INIT_ANGLE #18
+    [15,  # number of ground points
+     "0 2500", "100 200", "500 150", "1000 2000", "2000 2000", "2010 1500", "2200 800", "2500 200",
+     "6899 300", "6999 2500", "4100 2600", "4200 1000", "3500 800", "3100 1100", "3400 2900",
+     "6500 1300",  # INIT_X INIT_Y #16
+     "0 0",  # INIT_DX INIT_DY #17
+     "0"],  # INIT_ANGLE #18
+]
+
+
+def parse_state(line):
+    """
+    Parse the turn input of the game
+    :param line: "X Y hSpeed vSpeed fuel rotate power"
+    :return: the State of the lander
+    """
+    x, y, h_speed, v_speed, fuel, angle, power = map(int, line.split())
+    return State(fuel=fuel,
+                 power=power,
+                 angle=angle,
+                 speed=Vector(h_speed, v_speed),
+                 position=Vector(x, y),
+                 acceleration=Vector(0, 0))
+
+
+def parse_map(input_data):
+    """
+    Parse the inputs of a map
+    :param input_data: number of ground points, the ground points, the init position, speed and angle,
+                       or the number of ground points, the ground points and the first turn input of the game
+    :return: the ground points and the init state of the lander
+    """
+    num_ground_points = int(input_data[0])
     ground_points = input_data[1: 1+num_ground_points]
+    ground_points = ground_inputs_to_line(ground_points)
+    if len(input_data[1+num_ground_points].split()) == 7:
+        return ground_points, parse_state(input_data[1+num_ground_points])
+
     init_pos = input_data[1+num_ground_points]
     init_speed = input_data[2+num_ground_points]
     init_angle = input_data[3+num_ground_points]
 
     # parse into point object
-    ground_points = ground_inputs_to_line(ground_points)
     init_pos = Vector(*map(int, init_pos.split()))
     init_speed = Vector(*map(int, init_speed.split()))
     init_angle = int(init_angle)
@@ -56,31 +91,83 @@ def init():
                        speed=Vector(init_speed.x, init_speed.y),
                        position=Vector(init_pos.x, init_pos.y),
                        acceleration=Vector(0, 0))
+    return ground_points, init_state
+
+
+def init(checkpoint_writer=None, resume=None, metrics_sinks=None):
+    """
+    :param checkpoint_writer: optional CheckpointWriter saving the population periodically
+    :param resume: optional checkpoint file to resume the population from
+    :param metrics_sinks: optional list of MetricsSink receiving the metrics of every generation
+    """
+    if resume:
+        return Population.load(resume, workers=WORKERS, checkpoint_writer=checkpoint_writer,
+                               metrics_sinks=metrics_sinks)
+
+    ground_points, init_state = parse_map(MAPS[MAP_SELECTION])
 
     population = Population(mutation_rate=MUTATION_RATE,
                             pop_size=POPULATION_SIZE,
                             ground_points=ground_points,
                             init_state=init_state,
-                            max_lifecycle=MAX_LIFECYCLE)
+                            max_lifecycle=MAX_LIFECYCLE,
+                            elitism=ELITISM,
+                            workers=WORKERS,
+                            checkpoint_writer=checkpoint_writer,
+                            metrics_sinks=metrics_sinks)
 
-    population.display_current_population_simulation()
     return population
 
 
+def print_metrics(record):
+    print("Generation: {} best {:.3e} min {:.3e}".format(record["generation"], record["best_fitness"],
+                                                         record["min_fitness"]))
+
+
 def evolve(population):
     population.selection()
     population.reproduction()
 
 
 def main():
+    parser = argparse.ArgumentParser(description="Evolve a Mars lander controller")
+    parser.add_argument("--headless", action="store_true", default=HEADLESS,
+                        help="run without rendering the generations")
+    parser.add_argument("--patience", type=int, default=PATIENCE,
+                        help="stop after this many generations without improvement")
+    parser.add_argument("--keep-going", action="store_true", help="keep evolving once a lander has landed")
+    parser.add_argument("--metrics", help="JSON lines file receiving the metrics of every generation")
+    parser.add_argument("--checkpoint", help=f"file saving the population every {CHECKPOINT_INTERVAL} generations")
+    parser.add_argument("--resume", action="store_true", help="resume the population saved in the checkpoint file")
+    args = parser.parse_args()
+    if args.resume and not args.checkpoint:
+        parser.error("--resume needs a --checkpoint file")
+
     generation_count = 0
-    population = init()
+    checkpoint_writer = CheckpointWriter(args.checkpoint, CHECKPOINT_INTERVAL) if args.checkpoint else None
+    metrics_sinks = [CallbackSink(print_metrics)]
+    if args.metrics:
+        metrics_sinks.append(JsonlSink(args.metrics))
+    population = init(checkpoint_writer, args.checkpoint if args.resume else None, metrics_sinks)
+    renderer = None if args.headless else AsyncRenderer(population.ground_points)
+    if renderer:
+        renderer.submit(population.snapshot())
+    controller = AdaptiveController(patience=args.patience, stop_on=None if args.keep_going else LANDED)
     while True:
         evolve(population)
-        print("Generation: {}".format(generation_count))
-        if generation_count % REFRESH_RATE == 0:
-            population.display_current_population_simulation()
+        if renderer and generation_count % REFRESH_RATE == 0:
+            renderer.submit(population.snapshot())
         generation_count += 1
+        result = controller.update(population)
+        if result:
+            print("Stopped at generation {}: {}".format(generation_count, result))
+            break
+    if renderer:
+        renderer.submit(population.snapshot())
+        renderer.close()
+    if checkpoint_writer:
+        checkpoint_writer.close()
+    population.close()
 
 
 if __name__ == '__main__':
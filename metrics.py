@@ -0,0 +1,127 @@
+import json
+from collections import deque
+from queue import Queue
+from threading import Thread
+
+import numpy as np
+
+from chromosome import gene_diversity
+from lander import FlyState
+
+
+def generation_metrics(population, wall_time):
+    """
+    Summary of the current generation of a population
+    :param population: the Population, sorted best first
+    :param wall_time: seconds spent on the generation
+    :return: a dict of plain numbers, lists and strings
+    """
+    landers = population.population
+    fitness = np.array([lander.fitness for lander in landers])
+    histogram = {status.name: 0 for status in FlyState}
+    for lander in landers:
+        histogram[lander.status.name] += 1
+    best = landers[int(fitness.argmax())]
+    return {"generation": population.generation_count,
+            "best_fitness": float(fitness.max()),
+            "mean_fitness": float(fitness.mean()),
+            "min_fitness": float(fitness.min()),
+            "status": histogram,
+            "diversity": gene_diversity(np.stack([lander.chromosome.genes for lander in landers])),
+            "mutation_rate": population.mutation_rate,
+            "wall_time": wall_time,
+            "best_commands": best.chromosome.genes.tolist()}
+
+
+class MetricsSink:
+    """
+    Receiver of the metrics record of every generation
+    """
+
+    def write(self, record):
+        raise NotImplementedError
+
+    def close(self):
+        return None
+
+
+class CallbackSink(MetricsSink):
+    """
+    Hand every record to a function
+    """
+
+    def __init__(self, callback):
+        self.callback = callback
+
+    def write(self, record):
+        self.callback(record)
+
+
+class RingBufferSink(MetricsSink):
+    """
+    Keep the last records in memory, the oldest are dropped
+    """
+
+    def __init__(self, capacity=1000):
+        self.records = deque(maxlen=capacity)
+
+    def __len__(self):
+        return len(self.records)
+
+    def write(self, record):
+        self.records.append(record)
+
+
+def write_lines_loop(path, batches):
+    """
+    Append the batches of lines of the queue to a file until None is received
+    """
+    with open(path, "a") as metrics_file:
+        while True:
+            lines = batches.get()
+            if lines is None:
+                return
+            metrics_file.write("".join(lines))
+            metrics_file.flush()
+
+
+class JsonlSink(MetricsSink):
+    """
+    Append the records to a JSON lines file
+    Records are encoded as they come and written in batches of buffer_size by a background thread
+    """
+
+    def __init__(self, path, buffer_size=50):
+        """
+        :param path: the file, truncated first
+        :param buffer_size: records kept before a batch is handed to the writer thread
+        """
+        open(path, "w").close()
+        self.buffer_size = max(1, buffer_size)
+        self.lines = []
+        self.batches = Queue()
+        self.worker = Thread(target=write_lines_loop, args=(path, self.batches), daemon=True)
+        self.worker.start()
+
+    def write(self, record):
+        self.lines.append(json.dumps(record) + "\n")
+        if len(self.lines) >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        """
+        Hand the buffered records to the writer thread
+        """
+        if self.lines:
+            self.batches.put(self.lines)
+            self.lines = []
+
+    def close(self):
+        """
+        Write the buffered records and wait for the file to be complete
+        """
+        if self.worker:
+            self.flush()
+            self.batches.put(None)
+            self.worker.join()
+            self.worker = None
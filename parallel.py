@@ -0,0 +1,210 @@
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import os
+
+import numpy as np
+
+from batch import BatchResult, BatchSimulator
+from chromosome import GENE_DTYPE
+
+# The simulator of a worker process, built once by init_worker and kept for the life of the pool
+WORKER_SIMULATOR = None
+# Shared memory blocks mapped by a worker process, by block name, with their array
+WORKER_ARRAYS = {}
+
+# Per-lander results written in place by the workers, with their dtype
+RESULT_FIELDS = {"lengths": np.int64, "status": np.int64, "hit_mark": np.int64,
+                 "distance": np.float64, "fitness": np.float64, "penalty": np.float64}
+
+
+def init_worker(init_state, ground, max_lifecycle, prune=False):
+    """
+    Build the simulator held by a worker process
+    Each worker keeps its own copy of the terrain instead of sharing the Lander class globals
+    """
+    global WORKER_SIMULATOR
+    WORKER_SIMULATOR = BatchSimulator(init_state, ground, max_lifecycle, prune=prune)
+
+
+def evaluate_batch(genes, keep_trajectory, init_state):
+    """
+    Fly one batch of chromosomes inside a worker process
+    :param genes: (n, size, 2) gene matrix
+    :param keep_trajectory: send the trajectory arrays back along with the scores
+    :param init_state: the State the landers start from
+    :return: a BatchResult
+    """
+    WORKER_SIMULATOR.init_state = init_state
+    result = WORKER_SIMULATOR.simulate(genes)
+    if not keep_trajectory:
+        result = result.compact()
+    return result
+
+
+class SharedArrays:
+    """
+    Numpy arrays living in shared memory blocks, one block per array
+    The process creating them owns the blocks, other processes map them by name with attach
+    """
+
+    def __init__(self, shapes):
+        """
+        :param shapes: dict of array name to (shape, dtype)
+        """
+        self.blocks = {}
+        self.arrays = {}
+        for name, (shape, dtype) in shapes.items():
+            dtype = np.dtype(dtype)
+            block = shared_memory.SharedMemory(create=True, size=max(1, int(np.prod(shape)) * dtype.itemsize))
+            self.blocks[name] = block
+            self.arrays[name] = np.ndarray(shape, dtype=dtype, buffer=block.buf)
+
+    def __getitem__(self, name):
+        return self.arrays[name]
+
+    def spec(self):
+        """
+        :return: what attach needs to map the arrays in another process, a small dict of names and shapes
+        """
+        return {name: (self.blocks[name].name, array.shape, array.dtype.str) for name, array in self.arrays.items()}
+
+    @classmethod
+    def attach(cls, spec):
+        """
+        Map the arrays of a spec in a worker process, every block once
+        The blocks of former specs are let go
+        :return: dict of array name to array
+        """
+        names = {block_name for block_name, _, _ in spec.values()}
+        for block_name in list(WORKER_ARRAYS):
+            if block_name not in names:
+                block, _ = WORKER_ARRAYS.pop(block_name)
+                block.close()
+        arrays = {}
+        for name, (block_name, shape, dtype) in spec.items():
+            if block_name not in WORKER_ARRAYS:
+                block = shared_memory.SharedMemory(name=block_name)
+                WORKER_ARRAYS[block_name] = block, np.ndarray(shape, dtype=dtype, buffer=block.buf)
+            arrays[name] = WORKER_ARRAYS[block_name][1]
+        return arrays
+
+    def close(self):
+        """
+        Free the blocks, the arrays must not be used anymore
+        """
+        self.arrays = {}
+        for block in self.blocks.values():
+            block.close()
+            block.unlink()
+        self.blocks = {}
+
+
+def evaluate_rows(spec, start, stop, init_state):
+    """
+    Fly the rows [start, stop) of the shared gene matrix inside a worker process and write their scores in place
+    :param spec: SharedArrays.spec of the genes and the result arrays
+    :param init_state: the State the landers start from
+    :return: start and stop, once the rows are written
+    """
+    WORKER_SIMULATOR.init_state = init_state
+    arrays = SharedArrays.attach(spec)
+    result = WORKER_SIMULATOR.simulate(arrays["genes"][start:stop])
+    for name in RESULT_FIELDS:
+        arrays[name][start:stop] = getattr(result, name)
+    return start, stop
+
+
+class ParallelEvaluator:
+    """
+    Evaluate gene matrices on a pool of long-lived worker processes
+    The initial state goes along with every evaluation, setting init_state moves the flights without a new pool
+    When only the scores are needed, the genes and the scores go through shared memory,
+    the workers only receive and send back row ranges
+    """
+
+    def __init__(self, init_state, ground, max_lifecycle, workers=None, batch_size=None, prune=False):
+        """
+        :param workers: number of worker processes, one per core by default
+        :param batch_size: chromosomes sent to a worker at once, the population is split evenly by default
+        :param prune: stop the landers once the landing zone is out of reach
+        """
+        self.workers = workers or os.cpu_count() or 1
+        self.batch_size = batch_size
+        self.init_state = init_state
+        self.shared = None  # SharedArrays of the gene matrix and the scores, grown on demand
+        self.executor = ProcessPoolExecutor(max_workers=self.workers,
+                                            initializer=init_worker,
+                                            initargs=(init_state, ground, max_lifecycle, prune))
+
+    def chunk_bounds(self, count):
+        """
+        :return: the (start, stop) row ranges sent to the workers
+        """
+        if self.batch_size:
+            batches = max(1, -(-count // self.batch_size))
+        else:
+            batches = self.workers
+        sizes = [len(chunk) for chunk in np.array_split(np.arange(count), max(1, min(batches, count)))]
+        stops = np.cumsum(sizes).tolist()
+        return [(stop - size, stop) for size, stop in zip(sizes, stops) if size]
+
+    def evaluate(self, genes, keep_trajectory=False):
+        """
+        Fly a gene matrix across the pool
+        :param genes: (n, size, 2) gene matrix
+        :param keep_trajectory: also collect the trajectory arrays, only scores come back otherwise
+        :return: one BatchResult in the order of the genes
+        """
+        if not keep_trajectory:
+            return self.evaluate_shared(genes)
+        bounds = self.chunk_bounds(len(genes))
+        chunks = [genes[start:stop] for start, stop in bounds]
+        results = self.executor.map(evaluate_batch, chunks, [keep_trajectory] * len(chunks),
+                                    [self.init_state] * len(chunks))
+        result = BatchResult.concatenate(list(results))
+        result.init_state = self.init_state
+        return result
+
+    def shared_arrays(self, count, size):
+        """
+        :return: SharedArrays holding at least count chromosomes of size genes
+        """
+        shared = self.shared
+        if shared is not None and len(shared["genes"]) >= count and shared["genes"].shape[1] == size:
+            return shared
+        if shared is not None:
+            shared.close()
+        shapes = {"genes": ((count, size, 2), GENE_DTYPE)}
+        shapes.update({name: ((count,), dtype) for name, dtype in RESULT_FIELDS.items()})
+        self.shared = SharedArrays(shapes)
+        return self.shared
+
+    def evaluate_shared(self, genes):
+        """
+        Copy the genes to shared memory, let the workers fly their rows and read the scores back
+        :return: a BatchResult without trajectories
+        """
+        count = len(genes)
+        shared = self.shared_arrays(count, genes.shape[1])
+        shared["genes"][:count] = genes
+        spec = shared.spec()
+        bounds = self.chunk_bounds(count)
+        if bounds:
+            list(self.executor.map(evaluate_rows, [spec] * len(bounds), *zip(*bounds),
+                                   [self.init_state] * len(bounds)))
+        # copied out, the next evaluation writes over the shared arrays
+        scores = {name: shared[name][:count].copy() for name in RESULT_FIELDS}
+        return BatchResult(init_state=self.init_state,
+                           positions=None,
+                           speeds=None,
+                           accelerations=None,
+                           fuel=None,
+                           angles=None,
+                           powers=None,
+                           **scores)
+
+    def close(self):
+        self.executor.shutdown()
+        if self.shared is not None:
+            self.shared.close()
+            self.shared = None
@@ -1,11 +1,50 @@
 from math import cos, sin, radians, sqrt
 
+MIN_ANGLE = -90
+MAX_ANGLE = 90
+# cos and sin of every integer angle a chromosome can command, in degree
+ROTATIONS = {angle: (cos(radians(angle)), sin(radians(angle))) for angle in range(MIN_ANGLE, MAX_ANGLE + 1)}
+
+
+def rotation(angle):
+    """
+    :param angle: an angle in degree
+    :return: cos and sin of the angle, looked up for the integer angles in [MIN_ANGLE, MAX_ANGLE]
+    """
+    cos_sin = ROTATIONS.get(angle)
+    if cos_sin is None:
+        theta = radians(angle)
+        return cos(theta), sin(theta)
+    return cos_sin
+
+
+def segments_intersect(px, py, qx, qy, rx, ry, sx, sy):
+    """
+    Vector.do_intersect for the segments pq and rs given by integer coordinates
+    Each orientation is computed once, the collinear cases are only looked at when the general case fails
+    :return: True, if the two segments intersect; False, otherwise
+    """
+    d1 = (qy - py) * (rx - qx) - (qx - px) * (ry - qy)
+    d2 = (qy - py) * (sx - qx) - (qx - px) * (sy - qy)
+    d3 = (sy - ry) * (px - sx) - (sx - rx) * (py - sy)
+    d4 = (sy - ry) * (qx - sx) - (sx - rx) * (qy - sy)
+    # General Case, the orientations differ on both segments
+    if ((d1 > 0) != (d2 > 0) or (d1 < 0) != (d2 < 0)) and ((d3 > 0) != (d4 > 0) or (d3 < 0) != (d4 < 0)):
+        return True
+    # Special Cases, an end collinear with the other segment and lying on it
+    return ((d1 == 0 and min(px, qx) <= rx <= max(px, qx) and min(py, qy) <= ry <= max(py, qy)) or
+            (d2 == 0 and min(px, qx) <= sx <= max(px, qx) and min(py, qy) <= sy <= max(py, qy)) or
+            (d3 == 0 and min(rx, sx) <= px <= max(rx, sx) and min(ry, sy) <= py <= max(ry, sy)) or
+            (d4 == 0 and min(rx, sx) <= qx <= max(rx, sx) and min(ry, sy) <= qy <= max(ry, sy)))
+
 
 class Point:
     """
     Fundamental element
     Used to represent location
+    Never changed once created, every operation returns a new Point
     """
+    __slots__ = ("x", "y")
 
     def __init__(self, x, y):
         self.x = x
@@ -25,7 +64,9 @@ class Vector:
     """
     Basic element
     Used to represent speed, acceleration of the spaceship
+    Never changed once created, every operation returns a new Vector
     """
+    __slots__ = ("x", "y")
 
     def __init__(self, x, y):
         self.x = x
@@ -47,9 +88,7 @@ class Vector:
         :param angle: a specific angle (in degree)
         :return: The rotated vector
         """
-        theta = radians(angle)
-        cos_ = cos(theta)
-        sin_ = sin(theta)
+        cos_, sin_ = rotation(angle)
         return Vector(self.x * cos_ - self.y * sin_, self.x * sin_ + self.y * cos_)
 
     def magnitude(self):
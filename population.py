@@ -1,11 +1,21 @@
+import time
 from collections import namedtuple
-from copy import deepcopy, copy
+from copy import copy
 
 import numpy as np
-from matplotlib import pyplot as plt
 
-from chromosome import Chromosome
+from batch import BatchSimulator
+from checkpoint import Checkpoint
+from compiled import CompiledSimulator
+from chromosome import Chromosome, cross_over_genes, first_differences, mutate_genes, random_genes
+from history import TrajectoryHistory
 from lander import Lander
+from metrics import generation_metrics
+from parallel import ParallelEvaluator
+from profiling import NULL_PROFILER
+from renderer import GenerationSnapshot, draw_generation
+from selection import RouletteSelection
+from terrain import Terrain
 
 CMD_TUPLE = namedtuple("Command", ["angle", "power"])
 
@@ -20,120 +30,335 @@ class Population:
     total_distance = None
 
     INIT_STATE = None
+    ELITISM = 0.2  # share of the fittest landers kept as they are in the next generation
 
-    def __init__(self, mutation_rate, pop_size, init_state, ground_points, max_lifecycle):
+    def __init__(self, mutation_rate, pop_size, init_state, ground_points, max_lifecycle, vectorized=True,
+                 workers=None, history=None, profiler=None, selection_strategy=None, fitness_cache=None,
+                 genes=None, checkpoint_writer=None, prune=False, metrics_sinks=None, compiled=True,
+                 elitism=ELITISM):
+        """
+        :param genes: optional (pop_size, max_lifecycle, 2) gene matrix of the first generation, random walks otherwise
+        :param checkpoint_writer: optional CheckpointWriter called at the end of every generation
+        :param prune: stop the flights as soon as the landing zone is out of reach, they score as crashes
+                      on the ground under the lander, with a distance never better than the full flight
+        :param metrics_sinks: optional list of MetricsSink receiving the metrics of every generation
+        :param compiled: fly the chromosomes with the compiled kernel when vectorized, numba is installed and
+                         no trajectory history is asked for
+        :param elitism: share of the fittest landers copied to the next generation
+        """
+        self.generation_start = time.perf_counter()
+        self.metrics_sinks = list(metrics_sinks or [])
         self.mutation_rate = mutation_rate
+        if not 0 <= elitism < 1:
+            raise ValueError(f"elitism is a share of the population in [0, 1), got {elitism}")
+        self.elitism = elitism
         self.population = []
-        self.mating_pool = []
+        # indices of the parents of the next children, drawn from the sorted population by the selection strategy
+        self.parents = np.zeros(0, dtype=np.int64)
+        self.selection_strategy = selection_strategy or RouletteSelection()
         self.population_size = pop_size
         self.generation_count = 1
-        self.batch_simulations = []
-        self.all_simulations = []
+        # only the current generation is kept unless a history asks for more
+        self.history = history or TrajectoryHistory(retention="none")
+        # per-phase timing, a no-op unless a PhaseProfiler is given
+        self.profiler = profiler or NULL_PROFILER
+        self.checkpoint_writer = checkpoint_writer
         Population.MAX_LIFECYCLE = max_lifecycle
         Population.CHROMOSOME_SIZE = max_lifecycle
         Population.INIT_STATE = init_state
-        self.ground_points = ground_points
+        self.prune = prune
+        # ground_points may also be an already preprocessed Terrain
+        self.terrain = Terrain.of(ground_points)
+        self.ground_points = self.terrain.points
+        self.vectorized = vectorized
+        self.simulator = None
+        # the compiled kernel keeps no trajectories, they are flown again when read
+        compiled = compiled and self.history.retention == "none" and CompiledSimulator.available(self.terrain)
+        if vectorized and compiled:
+            self.simulator = CompiledSimulator(init_state, self.terrain, max_lifecycle, self.profiler, prune)
+        elif vectorized:
+            self.simulator = BatchSimulator(init_state, self.terrain, max_lifecycle, self.profiler, prune)
+        # scores of the chromosomes already flown, when a FitnessCache is given
+        self.fitness_cache = fitness_cache
+        # evaluate on a pool of worker processes when workers is set
+        self.workers = workers
+        self.evaluator = ParallelEvaluator(init_state, self.terrain, max_lifecycle, workers,
+                                           prune=prune) if workers else None
 
         # create and run the landers
-        for _ in range(self.population_size):
-            new_lander = Lander(chromosome=Chromosome(Population.CHROMOSOME_SIZE),
-                                init_state=Population.INIT_STATE,
-                                ground=self.ground_points,
-                                max_lifecycle=Population.MAX_LIFECYCLE)
-            self.population.append(new_lander)
+        with self.profiler.phase("chromosome_creation"):
+            if genes is None:
+                genes = random_genes(self.population_size, Population.CHROMOSOME_SIZE,
+                                     (init_state.angle, init_state.power))
+            chromosomes = [Chromosome(Population.CHROMOSOME_SIZE, chromosome_genes) for chromosome_genes in genes]
+        self.population.extend(self.create_landers(chromosomes, genes))
         self.simulate()
+        self.profiler.end_generation(self.generation_count)
+
+    @classmethod
+    def load(cls, path, ground_points=None, init_state=None, **options):
+        """
+        Resume a population from a checkpoint file, or warm-start another map from its genes
+        The generation count and the numpy RNG state are restored too
+        :param path: a file written by save or a CheckpointWriter
+        :param ground_points: the ground of another map, the saved one by default
+        :param init_state: the initial state on another map, the saved one by default
+        :param options: keyword arguments of Population,
+                        mutation_rate, pop_size, max_lifecycle and elitism default to the saved ones
+        :return: the Population
+        """
+        checkpoint = Checkpoint.read(path)
+        settings = dict(checkpoint.config)
+        settings.update(options)
+        genes = checkpoint.genes
+        if genes.shape[1] != settings["max_lifecycle"]:
+            raise ValueError(f"The checkpoint holds chromosomes of {genes.shape[1]} genes, "
+                             f"max_lifecycle is {settings['max_lifecycle']}")
+        if len(genes) != settings["pop_size"]:
+            # keep the fittest, or fill up with random chromosomes
+            genes = genes[np.argsort(-checkpoint.fitness, kind="stable")[:settings["pop_size"]]]
+            missing = random_genes(max(0, settings["pop_size"] - len(genes)), settings["max_lifecycle"])
+            genes = np.concatenate((genes, missing))
+        population = cls(init_state=init_state or checkpoint.init_state,
+                         ground_points=ground_points or checkpoint.ground_points(),
+                         genes=genes,
+                         **settings)
+        population.generation_count = checkpoint.generation
+        np.random.set_state(checkpoint.rng_state)
+        return population
+
+    def save(self, path):
+        """
+        Write a checkpoint of the population, read back by Population.load
+        """
+        Checkpoint.of(self).write(path)
+
+    def create_landers(self, chromosomes, genes=None):
+        """
+        Fly a list of chromosomes, all at once with the batch simulator when vectorized
+        :param chromosomes: the chromosomes to evaluate
+        :param genes: optional gene matrix of the chromosomes, stacked from them otherwise
+        :return: a list of Lander objects in the same order
+        """
+        with self.profiler.phase("simulation"):
+            if self.fitness_cache is None:
+                landers = self.fly_chromosomes(chromosomes, genes)
+            else:
+                landers = self.fly_cached(chromosomes, genes)
+        # the parents are only needed to start the flights, let them go, the cache hits too
+        for chromosome in chromosomes:
+            chromosome.parent = None
+        return landers
+
+    def fly_cached(self, chromosomes, genes):
+        """
+        Take the scores of known chromosomes from the fitness cache and only fly the others
+        """
+        landers = [None] * len(chromosomes)
+        misses = []
+        for i, chromosome in enumerate(chromosomes):
+            cached = self.fitness_cache.get(chromosome.genes)
+            if cached is None:
+                misses.append(i)
+            else:
+                landers[i] = Lander.from_scores(chromosome=chromosome,
+                                                init_state=Population.INIT_STATE,
+                                                ground=self.terrain,
+                                                max_lifecycle=Population.MAX_LIFECYCLE,
+                                                scores=cached,
+                                                prune=self.prune)
+        if misses:
+            flown = self.fly_chromosomes([chromosomes[i] for i in misses], None if genes is None else genes[misses])
+            for i, lander in zip(misses, flown):
+                landers[i] = lander
+                self.fitness_cache.put(lander.chromosome.genes, lander)
+        return landers
+
+    def fly_chromosomes(self, chromosomes, genes):
+        if not self.vectorized and not self.evaluator:
+            # trajectories are flown again on demand unless the history saves them
+            keep_trajectory = self.history.retention != "none"
+            return [Lander(chromosome=chromosome,
+                           init_state=Population.INIT_STATE,
+                           ground=self.terrain,
+                           max_lifecycle=Population.MAX_LIFECYCLE,
+                           keep_trajectory=keep_trajectory,
+                           parent=chromosome.parent,
+                           prune=self.prune) for chromosome in chromosomes]
+        if genes is None:
+            genes = BatchSimulator.stack_genes(chromosomes)
+        if self.evaluator:
+            # bring the trajectories back from the workers only when the history saves them
+            result = self.evaluator.evaluate(genes, keep_trajectory=self.history.retention != "none")
+        else:
+            result = self.simulator.simulate(genes, self.checkpoints(chromosomes))
+        return [Lander.from_batch(chromosome=chromosome,
+                                  batch_result=result,
+                                  index=i,
+                                  ground=self.terrain,
+                                  max_lifecycle=Population.MAX_LIFECYCLE,
+                                  prune=self.prune) for i, chromosome in enumerate(chromosomes)]
+
+    @classmethod
+    def checkpoints(cls, chromosomes):
+        """
+        :return: for each chromosome, where to start its flight in the batch simulation of its parent, or None
+        """
+        checkpoints = []
+        for chromosome in chromosomes:
+            parent = chromosome.parent
+            if parent is None or parent.batch_result is None or not parent.batch_result.has_trajectories():
+                checkpoints.append(None)
+            else:
+                checkpoints.append((parent.batch_result, parent.batch_index, chromosome.diverge_index))
+        return checkpoints
+
+    def close(self):
+        """
+        Stop the worker processes of the parallel evaluation and close the metrics sinks
+        """
+        if self.evaluator:
+            self.evaluator.close()
+        for sink in self.metrics_sinks:
+            sink.close()
 
     def simulate(self):
         """
-        From each chromosome in population we create object
-        of Lander class and compute trajectory
+        Register the trajectories of the current population in the history
         """
-        self.batch_simulations = []
-        for member in self.population:
-            self.batch_simulations.append(deepcopy(member.trajectory))
-        self.all_simulations.append(deepcopy(self.batch_simulations))
+        with self.profiler.phase("history"):
+            self.history.record(self.generation_count, self.population)
+
+    def snapshot(self):
+        """
+        :return: a GenerationSnapshot of the current population, for an AsyncRenderer
+        """
+        with self.profiler.phase("rendering"):
+            return GenerationSnapshot(self.generation_count,
+                                      [np.array(positions) for positions in self.history.current_trajectories()])
 
     def display_current_population_simulation(self):
         """
         Plot trajectory of every chromosome of population
         for all generations
         """
-        plt.ion()
-        plt.title(f"Simulation of generation - {self.generation_count}")
-
-        plt.clf()
-        x, y = [], []
-        for point in self.ground_points:
-            x.append(point.x)
-            y.append(point.y)
-        plt.plot(x, y)
-
-        for simulation in self.batch_simulations:
-            x, y = [], []
-            for state in simulation:
-                x.append(state.position.x)
-                y.append(state.position.y)
-            plt.plot(x, y)
-
-        plt.xlim([0, 7000])
-        plt.ylim([0, 3000])
-        plt.draw()
-        plt.pause(0.01)
+        snapshot = self.snapshot()
+        with self.profiler.phase("rendering"):
+            draw_generation(self.ground_points, snapshot)
 
     def selection(self):
-        self.mating_pool.clear()
-        # max_fitness, min_fitness, ave_fitness, ave_distance = self.evaluate_pop_fitness()
-        max_fitness = self.population[0].fitness
-        min_fitness = self.population[-1].fitness
-        print(max_fitness, min_fitness)
+        if self.metrics_sinks:
+            self.emit_metrics()
+        with self.profiler.phase("selection"):
+            self.select()
+
+    def emit_metrics(self):
+        """
+        Send the metrics of the current generation to the sinks
+        Its wall time runs from the previous metrics, or from the creation of the population
+        """
+        with self.profiler.phase("metrics"):
+            now = time.perf_counter()
+            record = generation_metrics(self, now - self.generation_start)
+            self.generation_start = now
+            for sink in self.metrics_sinks:
+                sink.write(record)
 
+    def select(self):
         # sort the population
         self.population.sort(key=lambda x: x.fitness, reverse=True)
+        fitness = np.array([lander.fitness for lander in self.population])
+        self.parents = self.selection_strategy.select(fitness, 2 * self.children_pairs())
 
-        for i in range(self.population_size):
-            fitness_normalized = (self.population[i].fitness - min_fitness) / (max_fitness - min_fitness)
+    def elite_count(self):
+        return int(self.elitism * self.population_size)
 
-            times = int(fitness_normalized * 100)
-            for j in range(times):
-                self.mating_pool.append(self.population[i])
+    def children_pairs(self):
+        return (self.population_size - self.elite_count() + 1) // 2
 
     def reproduction(self):
 
+        pairs = self.children_pairs()
+        with self.profiler.phase("crossover"):
+            # Pair the parents picked by the selection
+            moms, dads = self.parents[:pairs], self.parents[pairs:]
+            # Get their genes
+            mom_genes = np.stack([self.population[m].get_chromosome().genes for m in moms])
+            dad_genes = np.stack([self.population[d].get_chromosome().genes for d in dads])
+            # Mate their genes
+            # Cross over rate = 1
+            children0, children1 = cross_over_genes(mom_genes, dad_genes, np.random.random(pairs))
+            genes = np.stack((children0, children1), axis=1).reshape(2 * pairs, Population.CHROMOSOME_SIZE, 2)
+        with self.profiler.phase("mutation"):
+            mutate_genes(genes, self.mutation_rate)
+
+        # Remember which parent shares the longest prefix with each child
+        mom_genes = np.repeat(mom_genes, 2, axis=0)
+        dad_genes = np.repeat(dad_genes, 2, axis=0)
+        mom_prefix = first_differences(genes, mom_genes)
+        dad_prefix = first_differences(genes, dad_genes)
+        parents = [self.population[mom] if mom_prefix[2 * i + j] >= dad_prefix[2 * i + j] else self.population[dad]
+                   for i, (mom, dad) in enumerate(zip(moms, dads)) for j in range(2)]
+        diverge_indices = np.maximum(mom_prefix, dad_prefix).tolist()
+
         # elitism selection
         elitism_pool = []
-        for i in range(int(0.2 * self.population_size)):
+        for i in range(self.elite_count()):
             elitism_pool.append(copy(self.population[i]))
         self.population.clear()
         self.population.extend(copy(elitism_pool))
-        while len(self.population) < self.population_size:
-            # Spin the wheel of fortune to pick two parents
-
-            m = np.random.randint(len(self.mating_pool))
-            d = np.random.randint(len(self.mating_pool))
-            # Pick two parents
-            mom = self.mating_pool[m]
-            dad = self.mating_pool[d]
-            # Get their genes
-            mom_genes = mom.get_chromosome()
-            dad_genes = dad.get_chromosome()
-            # Mate their genes
-            # Cross over rate = 1
-            child0, child1 = mom_genes.cross_over(dad_genes)
-            child0.mutate(self.mutation_rate)
-            child1.mutate(self.mutation_rate)
-
-            # Fill the new population with the new child
-            self.population.append(Lander(chromosome=child0,
-                                          init_state=Population.INIT_STATE,
-                                          ground=self.ground_points,
-                                          max_lifecycle=Population.MAX_LIFECYCLE))
-            self.population.append(Lander(chromosome=child1,
-                                          init_state=Population.INIT_STATE,
-                                          ground=self.ground_points,
-                                          max_lifecycle=Population.MAX_LIFECYCLE))
+
+        # Fill the new population with the new children
+        with self.profiler.phase("chromosome_creation"):
+            children = [Chromosome(Population.CHROMOSOME_SIZE, child_genes) for child_genes in genes]
+            for child, parent, diverge_index in zip(children, parents, diverge_indices):
+                child.parent = parent
+                child.diverge_index = diverge_index
+        self.population.extend(self.create_landers(children, genes))
         # Increase the generation count
-        self.simulate()
         self.generation_count += 1
+        self.simulate()
+        self.profiler.end_generation(self.generation_count)
+        if self.checkpoint_writer:
+            self.checkpoint_writer.end_generation(self)
+
+    def best_landers(self, count=1):
+        """
+        :param count: number of landers
+        :return: the fittest landers, best first
+        """
+        return sorted(self.population, key=lambda x: x.fitness, reverse=True)[:count]
+
+    def immigrate(self, genes):
+        """
+        Replace the least fit landers with landers flown from foreign genes
+        :param genes: (n, size, 2) gene matrix of the immigrants
+        """
+        if len(genes) == 0:
+            return
+        self.population.sort(key=lambda x: x.fitness, reverse=True)
+        del self.population[max(0, self.population_size - len(genes)):]
+        chromosomes = [Chromosome(Population.CHROMOSOME_SIZE, immigrant_genes) for immigrant_genes in genes]
+        self.population.extend(self.create_landers(chromosomes, genes))
+
+    def restart(self, init_state, genes):
+        """
+        Replace the whole population with landers flown from another initial state
+        :param init_state: the State every lander starts from, e.g. the observed state of a running game
+        :param genes: (pop_size, size, 2) gene matrix of the new population
+        """
+        Population.INIT_STATE = init_state
+        if self.simulator:
+            self.simulator.init_state = init_state
+        if self.evaluator:
+            # the pool and its shared memory stay, the new state goes along with the next evaluations
+            self.evaluator.init_state = init_state
+        if self.fitness_cache is not None:
+            # the scores were flown from the former initial state
+            self.fitness_cache.clear()
+        chromosomes = [Chromosome(Population.CHROMOSOME_SIZE, chromosome_genes) for chromosome_genes in genes]
+        self.population = self.create_landers(chromosomes, genes)
+        self.simulate()
 
     def evaluate_pop_fitness(self):
         max_fitness = self.population[0].fitness
@@ -0,0 +1,148 @@
+import csv
+import json
+import time
+import tracemalloc
+
+PHASES = ("chromosome_creation", "crossover", "mutation", "simulation", "collision", "pruning", "fitness",
+          "selection", "metrics", "history", "rendering")
+# phases run at every tick of a simulation, a tracemalloc snapshot there would cost more than the tick
+TICK_PHASES = ("collision", "pruning")
+
+
+class NullPhase:
+    """
+    Context manager doing nothing, shared by every phase of a disabled profiler
+    """
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+NULL_PHASE = NullPhase()
+
+
+class NullProfiler:
+    """
+    Profiler used when profiling is disabled, every hook is a no-op
+    """
+    enabled = False
+
+    def phase(self, name):
+        return NULL_PHASE
+
+    def end_generation(self, generation):
+        return None
+
+
+NULL_PROFILER = NullProfiler()
+
+
+class Phase:
+    """
+    Time (and optionally count the allocations of) one run of a phase
+    The phases of TICK_PHASES only measure the growth of the traced memory, without counting the blocks
+    """
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+        self.start = None
+        self.snapshot = None
+        self.traced = None
+
+    def __enter__(self):
+        if self.profiler.trace_allocations:
+            if self.name in TICK_PHASES:
+                self.traced = tracemalloc.get_traced_memory()[0]
+            else:
+                self.snapshot = tracemalloc.take_snapshot()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        elapsed = time.perf_counter() - self.start
+        allocations = allocated = 0
+        if self.snapshot is not None:
+            for stat in tracemalloc.take_snapshot().compare_to(self.snapshot, "filename"):
+                if stat.count_diff > 0:
+                    allocations += stat.count_diff
+                    allocated += stat.size_diff
+        if self.traced is not None:
+            allocated = max(0, tracemalloc.get_traced_memory()[0] - self.traced)
+        self.profiler.add(self.name, elapsed, allocations, allocated)
+        return False
+
+
+class PhaseProfiler:
+    """
+    Wall time, call count and, with trace_allocations, tracemalloc allocation counts of every phase of a generation
+    Allocations are the memory blocks (and bytes) a phase leaves allocated, per source file,
+    only the bytes are measured for the phases of TICK_PHASES
+    collision, pruning and fitness are measured inside the batch simulator and are part of the simulation time
+    """
+    enabled = True
+
+    def __init__(self, trace_allocations=False, callback=None):
+        """
+        :param trace_allocations: count the allocations of every phase with tracemalloc, this slows the run down
+        :param callback: called with the record of every finished generation
+        """
+        self.trace_allocations = trace_allocations
+        self.callback = callback
+        self.current = self.empty_record()
+        self.records = []
+        if trace_allocations and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    @classmethod
+    def empty_record(cls):
+        record = {}
+        for name in PHASES:
+            record[f"{name}.time"] = 0.0
+            record[f"{name}.calls"] = 0
+            record[f"{name}.allocations"] = 0
+            record[f"{name}.allocated_bytes"] = 0
+        return record
+
+    def phase(self, name):
+        """
+        :param name: one of PHASES
+        :return: a context manager measuring the code it wraps
+        """
+        return Phase(self, name)
+
+    def add(self, name, elapsed, allocations=0, allocated=0):
+        self.current[f"{name}.time"] += elapsed
+        self.current[f"{name}.calls"] += 1
+        self.current[f"{name}.allocations"] += allocations
+        self.current[f"{name}.allocated_bytes"] += allocated
+
+    def end_generation(self, generation):
+        """
+        Close the record of a generation and start the next one
+        :param generation: the generation count
+        :return: the record of the generation
+        """
+        record = {"generation": generation}
+        record.update(self.current)
+        self.records.append(record)
+        self.current = self.empty_record()
+        if self.callback:
+            self.callback(record)
+        return record
+
+    def export_csv(self, path):
+        """
+        Write one line per generation
+        """
+        with open(path, "w", newline="") as csv_file:
+            writer = csv.DictWriter(csv_file, fieldnames=["generation"] + list(self.empty_record()))
+            writer.writeheader()
+            writer.writerows(self.records)
+
+    def export_json(self, path):
+        with open(path, "w") as json_file:
+            json.dump(self.records, json_file, indent=2)
@@ -0,0 +1,96 @@
+from multiprocessing import Process, Queue as ProcessQueue
+from queue import Empty, Full, Queue
+from threading import Thread
+
+
+class GenerationSnapshot:
+    """
+    What the renderer needs to draw one generation
+    """
+
+    def __init__(self, generation, trajectories):
+        """
+        :param generation: the generation count
+        :param trajectories: the positions of every lander, one (n, 2) array per lander
+        """
+        self.generation = generation
+        self.trajectories = trajectories
+
+
+def draw_generation(ground_points, snapshot):
+    """
+    Plot the ground and every trajectory of a generation, as a single LineCollection
+    :param ground_points: the ground points, anything with x and y
+    :param snapshot: the GenerationSnapshot to draw
+    """
+    from matplotlib import pyplot as plt
+    from matplotlib.collections import LineCollection
+
+    plt.ion()
+    plt.clf()
+    plt.title(f"Simulation of generation - {snapshot.generation}")
+    plt.plot([point.x for point in ground_points], [point.y for point in ground_points])
+    plt.gca().add_collection(LineCollection(snapshot.trajectories, linewidths=0.5,
+                                            colors=[f"C{i % 10}" for i in range(len(snapshot.trajectories))]))
+    plt.xlim([0, 7000])
+    plt.ylim([0, 3000])
+    plt.draw()
+    plt.pause(0.01)
+
+
+def render_loop(ground_points, snapshots):
+    """
+    Draw snapshots until a None is received
+    """
+    while True:
+        snapshot = snapshots.get()
+        if snapshot is None:
+            return
+        draw_generation(ground_points, snapshot)
+
+
+class AsyncRenderer:
+    """
+    Draw generations away from the evolution loop
+    Snapshots are sent through a one-slot queue: when the renderer falls behind,
+    the waiting frame is replaced by the newest one instead of stalling evolution
+    """
+
+    def __init__(self, ground_points, use_process=True):
+        """
+        :param ground_points: the ground points of the map
+        :param use_process: draw in a separate process, otherwise in a thread of this process
+        """
+        self.dropped_frames = 0
+        if use_process:
+            self.snapshots = ProcessQueue(maxsize=1)
+            self.worker = Process(target=render_loop, args=(ground_points, self.snapshots), daemon=True)
+        else:
+            self.snapshots = Queue(maxsize=1)
+            self.worker = Thread(target=render_loop, args=(ground_points, self.snapshots), daemon=True)
+        self.worker.start()
+
+    def submit(self, snapshot):
+        """
+        Queue a snapshot for drawing, dropping the frame still waiting if there is one
+        :param snapshot: the GenerationSnapshot to draw
+        """
+        try:
+            self.snapshots.put_nowait(snapshot)
+        except Full:
+            try:
+                self.snapshots.get_nowait()
+                self.dropped_frames += 1
+            except Empty:
+                pass
+            try:
+                self.snapshots.put_nowait(snapshot)
+            except Full:
+                self.dropped_frames += 1
+
+    def close(self):
+        """
+        Stop the renderer once the frame in the queue is drawn
+        """
+        self.snapshots.put(None)
+        self.worker.join()
@@ -0,0 +1,95 @@
+import numpy as np
+
+
+class SelectionStrategy:
+    """
+    Pick parents from the fitness of a population
+    Strategies sample indices directly from the fitness array, nothing grows with anything but the population size
+    """
+
+    def select(self, fitness, count):
+        """
+        :param fitness: (n,) array of fitness
+        :param count: number of parents to pick
+        :return: (count,) array of indices into fitness
+        """
+        raise NotImplementedError
+
+
+def sample_cumulative(cumulative_weights, count):
+    """
+    Roulette wheel over cumulative weights
+    :return: (count,) indices, drawn with probability proportional to their weight
+    """
+    total = cumulative_weights[-1]
+    if total <= 0:
+        return np.random.randint(len(cumulative_weights), size=count)
+    return np.searchsorted(cumulative_weights, np.random.random(count) * total, side="right")
+
+
+class RouletteSelection(SelectionStrategy):
+    """
+    Fitness-proportional selection with min-max normalization
+    Each lander weighs int(normalized fitness * 100), the odds of the former materialized mating pool
+    """
+
+    def __init__(self, resolution=100):
+        self.resolution = resolution
+
+    def weights(self, fitness):
+        max_fitness, min_fitness = fitness.max(), fitness.min()
+        if max_fitness == min_fitness:
+            # every lander is as fit as the others
+            return np.full(len(fitness), float(self.resolution))
+        return np.floor((fitness - min_fitness) / (max_fitness - min_fitness) * self.resolution)
+
+    def select(self, fitness, count):
+        return sample_cumulative(np.cumsum(self.weights(fitness)), count)
+
+
+class StochasticUniversalSampling(RouletteSelection):
+    """
+    Fitness-proportional selection with evenly spaced pointers, a single random draw per call
+    The picks are shuffled so consecutive parents are not sorted by fitness
+    """
+
+    def select(self, fitness, count):
+        cumulative_weights = np.cumsum(self.weights(fitness))
+        step = cumulative_weights[-1] / count
+        pointers = np.random.uniform(0, step) + step * np.arange(count)
+        indices = np.searchsorted(cumulative_weights, pointers, side="right")
+        return np.random.permutation(np.minimum(indices, len(fitness) - 1))
+
+
+class TournamentSelection(SelectionStrategy):
+    """
+    Each parent is the fittest of `size` landers drawn at random
+    """
+
+    def __init__(self, size=3):
+        self.size = size
+
+    def select(self, fitness, count):
+        contestants = np.random.randint(len(fitness), size=(count, self.size))
+        return contestants[np.arange(count), np.argmax(fitness[contestants], axis=1)]
+
+
+class RankSelection(SelectionStrategy):
+    """
+    Linear ranking: the odds of a lander only depend on its rank
+    pressure in [1, 2] is the expected number of picks of the best lander per pick of an average one
+    """
+
+    def __init__(self, pressure=1.5):
+        self.pressure = pressure
+        self.cumulative_weights = {}  # population size -> cumulative weights of the ranks, best first
+
+    def rank_weights(self, size):
+        if size not in self.cumulative_weights:
+            ranks = np.arange(size - 1, -1, -1) / max(size - 1, 1)
+            self.cumulative_weights[size] = np.cumsum(2 - self.pressure + 2 * (self.pressure - 1) * ranks)
+        return self.cumulative_weights[size]
+
+    def select(self, fitness, count):
+        order = np.argsort(-fitness, kind="stable")
+        return order[sample_cumulative(self.rank_weights(len(fitness)), count)]
@@ -0,0 +1,175 @@
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from adaptive import AdaptiveController, LANDED
+from cache import TerrainCache
+from main import ELITISM, MAX_LIFECYCLE, MUTATION_RATE, POPULATION_SIZE, parse_map
+from population import Population
+from terrain import Terrain
+
+GENERATIONS = 200
+CACHE_DIRECTORY = ".terrain_cache"
+
+
+def read_map_file(path):
+    """
+    :param path: a text file with the inputs of a map, one per line, as in main.MAPS
+    :return: the input lines
+    """
+    with open(path) as map_file:
+        return [line.strip() for line in map_file if line.strip()]
+
+
+def read_maps(source):
+    """
+    Read the maps to solve
+    :param source: a directory of map files, a JSONL file, or "-" for JSONL on stdin
+                   every JSONL line is {"name": ..., "input": [...]}, input holding the lines of a map file
+    :return: iterator of (name, input lines)
+    """
+    if os.path.isdir(source):
+        for file_name in sorted(os.listdir(source)):
+            path = os.path.join(source, file_name)
+            if os.path.isfile(path):
+                yield file_name, read_map_file(path)
+        return
+    stream = sys.stdin if source == "-" else open(source)
+    try:
+        for number, line in enumerate(stream):
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            input_data = entry["input"]
+            if isinstance(input_data, str):
+                input_data = input_data.splitlines()
+            yield entry.get("name", f"map{number}"), [str(item).strip() for item in input_data if str(item).strip()]
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+
+def solve_map(name, input_data, config):
+    """
+    Evolve a population on one map until its budget is spent
+    :param config: dict of the population settings, the budget and the terrain cache directory
+    :return: a dict with the best command sequence, its fitness and status, and the generations used
+    """
+    start = time.perf_counter()
+    np.random.seed(config["seed"])
+    ground_points, init_state = parse_map(input_data)
+    if config["cache_directory"]:
+        terrain = TerrainCache(config["cache_directory"]).get(ground_points)
+    else:
+        terrain = Terrain(ground_points)
+    generations = 0
+    controller = AdaptiveController(patience=config["patience"], stop_on=LANDED if config["stop_when_landed"] else None)
+    result = None
+    population = Population(mutation_rate=config["mutation_rate"],
+                            pop_size=config["pop_size"],
+                            init_state=init_state,
+                            ground_points=terrain,
+                            max_lifecycle=config["max_lifecycle"],
+                            elitism=config["elitism"],
+                            prune=config["prune"])
+    while config["generations"] is None or generations < config["generations"]:
+        if config["time_limit"] is not None and time.perf_counter() - start >= config["time_limit"]:
+            break
+        population.selection()
+        population.reproduction()
+        generations += 1
+        result = controller.update(population)
+        if result:
+            break
+    population.close()
+    best = population.best_landers()[0]
+    commands = best.chromosome.genes[:len(best.trajectory) - 1]
+    return {"name": name,
+            "map_hash": Terrain.map_hash(ground_points),
+            "status": best.status.name,
+            "fitness": best.fitness,
+            "distance": float(best.distance),
+            "generations": generations,
+            "stopped": result,
+            "elapsed": time.perf_counter() - start,
+            "commands": commands.tolist()}
+
+
+def solve_maps(maps, config, workers=None):
+    """
+    Solve maps concurrently, one process per map
+    :param maps: iterable of (name, input lines)
+    :param workers: number of processes, the maps are solved in this process when 1
+    :return: iterator of the results of solve_map, as they finish
+             a map that fails yields {"name": ..., "error": ...}
+    """
+    if workers == 1:
+        for name, input_data in maps:
+            try:
+                yield solve_map(name, input_data, config)
+            except Exception as error:
+                yield {"name": name, "error": repr(error)}
+        return
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(solve_map, name, input_data, config): name for name, input_data in maps}
+        for future in as_completed(futures):
+            try:
+                yield future.result()
+            except Exception as error:
+                yield {"name": futures[future], "error": repr(error)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Solve many maps and stream the best command sequences as JSONL")
+    parser.add_argument("source", help="a directory of map files, a JSONL file of maps, or - for JSONL on stdin")
+    parser.add_argument("--output", help="where to write the results, stdout by default")
+    parser.add_argument("--generations", type=int, default=GENERATIONS,
+                        help="generations per map, 0 for no limit when --time-limit is set")
+    parser.add_argument("--time-limit", type=float, help="seconds per map")
+    parser.add_argument("--full-budget", action="store_true",
+                        help="keep evolving after a lander has landed")
+    parser.add_argument("--patience", type=int, help="stop after this many generations without improvement")
+    parser.add_argument("--workers", type=int, help="number of processes, all the cores by default")
+    parser.add_argument("--population", type=int, default=POPULATION_SIZE)
+    parser.add_argument("--lifecycle", type=int, default=MAX_LIFECYCLE)
+    parser.add_argument("--mutation-rate", type=float, default=MUTATION_RATE)
+    parser.add_argument("--elitism", type=float, default=ELITISM,
+                        help="share of the fittest landers kept in the next generation")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--prune", action="store_true",
+                        help="stop the flights that can no longer reach the landing zone")
+    parser.add_argument("--cache-dir", default=CACHE_DIRECTORY, help="where the preprocessed terrains are saved")
+    parser.add_argument("--no-cache", action="store_true", help="preprocess every terrain again")
+    args = parser.parse_args()
+
+    if not args.generations and args.time_limit is None:
+        parser.error("--generations 0 needs a --time-limit")
+    config = {"mutation_rate": args.mutation_rate,
+              "pop_size": args.population,
+              "max_lifecycle": args.lifecycle,
+              "elitism": args.elitism,
+              "generations": args.generations or None,
+              "time_limit": args.time_limit,
+              "stop_when_landed": not args.full_budget,
+              "patience": args.patience,
+              "seed": args.seed,
+              "prune": args.prune,
+              "cache_directory": None if args.no_cache else args.cache_dir}
+
+    output = open(args.output, "w") if args.output else sys.stdout
+    try:
+        for result in solve_maps(read_maps(args.source), config, args.workers):
+            output.write(json.dumps(result) + "\n")
+            output.flush()
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,261 @@
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import numpy as np
+
+from lander import FlyState
+from main import ELITISM, MAP_SELECTION, MAPS, MAX_LIFECYCLE, MUTATION_RATE, POPULATION_SIZE, parse_map
+from population import Population
+from solver import read_map_file
+
+DEFAULTS = {"mutation_rate": MUTATION_RATE, "pop_size": POPULATION_SIZE, "max_lifecycle": MAX_LIFECYCLE,
+            "elitism": ELITISM, "map": MAP_SELECTION, "seed": 0}
+GENERATIONS = 200
+ETA = 3  # one run out of ETA goes on to the next rung
+RUNGS = 3
+COLUMNS = ("map", "mutation_rate", "pop_size", "max_lifecycle", "elitism", "seed",
+           "generations", "rung", "best_fitness", "status", "result", "elapsed")
+
+
+def expand(spec):
+    """
+    Every combination of the values of a sweep spec
+    :param spec: dict of a setting to a value or a list of values,
+                 the settings are mutation_rate, pop_size, max_lifecycle, elitism, map and seed
+                 a map is an index in main.MAPS or the path of a map file
+    :return: list of run dicts, with the defaults of main.py for the missing settings
+    """
+    unknown = set(spec) - set(DEFAULTS)
+    if unknown:
+        raise ValueError(f"Unknown settings {sorted(unknown)}, expected some of {sorted(DEFAULTS)}")
+    values = {name: spec.get(name, default) for name, default in DEFAULTS.items()}
+    values = {name: value if isinstance(value, list) else [value] for name, value in values.items()}
+    return [dict(zip(values, combination)) for combination in itertools.product(*values.values())]
+
+
+def map_input(map_choice):
+    """
+    :param map_choice: an index in main.MAPS or the path of a map file
+    :return: the input lines of the map
+    """
+    if isinstance(map_choice, int):
+        return MAPS[map_choice]
+    return read_map_file(map_choice)
+
+
+def run_segment(run, input_data, checkpoint, generations, time_limit):
+    """
+    Evolve one run up to a generation count, inside a worker process
+    The population is resumed from its checkpoint when there is one and saved back to it at the end
+    :param run: the run dict, as made by expand
+    :param checkpoint: the checkpoint file of the run
+    :param generations: generations the run has evolved in total at the end of the segment
+    :param time_limit: seconds for the segment, None for no limit
+    :return: dict of the generations evolved, the best fitness and status, whether a lander landed
+             and the seconds spent
+    """
+    start = time.perf_counter()
+    if os.path.exists(checkpoint):
+        population = Population.load(checkpoint)
+    else:
+        np.random.seed(run["seed"])
+        ground_points, init_state = parse_map(input_data)
+        population = Population(mutation_rate=run["mutation_rate"],
+                                pop_size=run["pop_size"],
+                                init_state=init_state,
+                                ground_points=ground_points,
+                                max_lifecycle=run["max_lifecycle"],
+                                elitism=run["elitism"])
+    landed = False
+    while population.generation_count - 1 < generations:
+        if time_limit is not None and time.perf_counter() - start >= time_limit:
+            break
+        population.selection()
+        population.reproduction()
+        landed = any(lander.status is FlyState.Landed for lander in population.population)
+        if landed:
+            break
+    best = population.best_landers()[0]
+    population.save(checkpoint)
+    population.close()
+    return {"generations": population.generation_count - 1,
+            "best_fitness": best.fitness,
+            "status": best.status.name,
+            "landed": landed,
+            "elapsed": time.perf_counter() - start}
+
+
+class SweepScheduler:
+    """
+    Run many GA runs on a bounded pool of worker processes, with successive halving
+    The runs of a map evolve rung by rung: after each rung, only the best 1 / eta go on to a budget eta times larger,
+    the others are cancelled. Runs that land are done. The maps are scheduled independently
+    """
+
+    def __init__(self, runs, generations=GENERATIONS, time_limit=None, workers=None, eta=ETA, rungs=RUNGS,
+                 directory=None):
+        """
+        :param runs: list of run dicts, as made by expand
+        :param generations: generations of a run that makes it to the last rung
+        :param time_limit: seconds of a run over all its rungs, None for no limit
+        :param workers: number of processes, all the cores by default
+        :param eta: factor between the budgets, and between the runs, of two rungs
+        :param rungs: number of rungs, 1 to run everything with the full budget
+        :param directory: where the checkpoints of the runs go, a temporary directory by default
+        """
+        self.runs = runs
+        self.generations = generations
+        self.time_limit = time_limit
+        self.workers = workers or os.cpu_count() or 1
+        self.eta = eta
+        self.rungs = max(1, rungs)
+        self.directory = directory
+        self.executor = None
+        self.records = []
+
+    def budgets(self):
+        """
+        :return: generations a run has evolved in total at the end of every rung
+        """
+        return [max(1, round(self.generations / self.eta ** (self.rungs - 1 - rung))) for rung in range(self.rungs)]
+
+    async def segment(self, record, generations):
+        """
+        Evolve a run up to a generation count on the pool, its record is updated in place
+        """
+        remaining = None if self.time_limit is None else max(0.0, self.time_limit - record["elapsed"])
+        loop = asyncio.get_running_loop()
+        try:
+            segment = partial(run_segment, record["run"], record["input"], record["checkpoint"], generations,
+                              remaining)
+            result = await loop.run_in_executor(self.executor, segment)
+        except Exception as error:
+            record["result"] = "error"
+            record["error"] = repr(error)
+            return
+        record["elapsed"] += result.pop("elapsed")
+        record.update(result)
+        if result["landed"]:
+            record["result"] = "landed"
+        elif result["generations"] < generations:
+            record["result"] = "out_of_time"
+
+    async def run_group(self, records):
+        """
+        Successive halving over the runs of one map
+        """
+        alive = records
+        for rung, budget in enumerate(self.budgets()):
+            await asyncio.gather(*(self.segment(record, budget) for record in alive))
+            for record in alive:
+                record["rung"] = rung
+            alive = [record for record in alive if record["result"] is None]
+            if rung == self.rungs - 1:
+                break
+            alive.sort(key=lambda record: record["best_fitness"], reverse=True)
+            keep = max(1, len(alive) // self.eta)
+            for record in alive[keep:]:
+                record["result"] = "cancelled"
+            alive = alive[:keep]
+        for record in alive:
+            record["result"] = "done"
+
+    async def run(self):
+        """
+        :return: one record per run, with its settings, budget used, best fitness and status, and how it ended
+        """
+        with tempfile.TemporaryDirectory(dir=self.directory) as directory:
+            self.records = []
+            for number, run in enumerate(self.runs):
+                self.records.append({"run": run,
+                                     "input": map_input(run["map"]),
+                                     "checkpoint": os.path.join(directory, f"run{number}.ckpt"),
+                                     "generations": 0,
+                                     "rung": None,
+                                     "best_fitness": None,
+                                     "status": None,
+                                     "landed": False,
+                                     "result": None,
+                                     "elapsed": 0.0})
+            groups = {}
+            for record in self.records:
+                groups.setdefault(json.dumps(record["run"]["map"]), []).append(record)
+            with ProcessPoolExecutor(max_workers=self.workers) as self.executor:
+                await asyncio.gather(*(self.run_group(records) for records in groups.values()))
+            self.executor = None
+        return [summary(record) for record in self.records]
+
+
+def summary(record):
+    """
+    :return: a flat dict of the settings and the outcome of a run
+    """
+    row = dict(record["run"])
+    row.update({name: record[name] for name in ("generations", "rung", "best_fitness", "status", "result",
+                                                "elapsed")})
+    if "error" in record:
+        row["error"] = record["error"]
+    return row
+
+
+def format_table(rows, columns=COLUMNS):
+    """
+    :param rows: the summary dicts of the runs
+    :return: a text table, best fitness first within every map
+    """
+    rows = sorted(rows, key=lambda row: (str(row["map"]), -(row["best_fitness"] or 0.0)))
+    cells = [[format_cell(row.get(column)) for column in columns] for row in rows]
+    widths = [max(len(column), *(len(line[i]) for line in cells)) for i, column in enumerate(columns)]
+    lines = ["  ".join(column.ljust(width) for column, width in zip(columns, widths))]
+    lines.extend("  ".join(cell.ljust(width) for cell, width in zip(line, widths)) for line in cells)
+    return "\n".join(lines)
+
+
+def format_cell(value):
+    if value is None:
+        return "-"
+    if isinstance(value, float):
+        return f"{value:.3e}" if value and abs(value) < 1e-2 else f"{value:.3f}"
+    return str(value)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sweep GA settings over maps with successive halving")
+    parser.add_argument("spec", help="a JSON file mapping settings to a value or a list of values, - for stdin")
+    parser.add_argument("--generations", type=int, default=GENERATIONS, help="generations of the runs kept to the end")
+    parser.add_argument("--time-limit", type=float, help="seconds per run over all its rungs")
+    parser.add_argument("--workers", type=int, help="number of processes, all the cores by default")
+    parser.add_argument("--eta", type=int, default=ETA, help="one run out of eta goes on to the next rung")
+    parser.add_argument("--rungs", type=int, default=RUNGS, help="1 to give every run the full budget")
+    parser.add_argument("--output", help="also write the results as JSONL")
+    args = parser.parse_args()
+
+    if args.spec == "-":
+        spec = json.load(sys.stdin)
+    else:
+        with open(args.spec) as spec_file:
+            spec = json.load(spec_file)
+    scheduler = SweepScheduler(expand(spec),
+                               generations=args.generations,
+                               time_limit=args.time_limit,
+                               workers=args.workers,
+                               eta=max(2, args.eta),
+                               rungs=args.rungs)
+    rows = asyncio.run(scheduler.run())
+    if args.output:
+        with open(args.output, "w") as output_file:
+            for row in rows:
+                output_file.write(json.dumps(row) + "\n")
+    print(format_table(rows))
+
+
+if __name__ == '__main__':
+    main()
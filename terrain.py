@@ -0,0 +1,335 @@
+from hashlib import blake2b
+from math import sqrt
+
+import numpy as np
+
+from plane import Vector, segments_intersect
+
+
+def first_crossings(ax, ay, bx, by, ground_x, ground_y):
+    """
+    Array form of Vector.is_line_crossing_other: many segments against all the ground lines at once
+    Orientations are kept as signs, the collinear cases are only checked for the pairs where one is 0
+    :param ax, ay, bx, by: (n,) int arrays, the segments ab to check
+    :param ground_x, ground_y: (g,) int arrays, the ground points
+    :return: (n,) array with the index of the first crossed ground line, or -1
+    """
+    ax, ay, bx, by = ax[:, None], ay[:, None], bx[:, None], by[:, None]
+    cx, cy = ground_x[None, :-1], ground_y[None, :-1]
+    dx, dy = ground_x[None, 1:], ground_y[None, 1:]
+
+    s1 = np.sign((by - ay) * (cx - bx) - (bx - ax) * (cy - by))
+    s2 = np.sign((by - ay) * (dx - bx) - (bx - ax) * (dy - by))
+    s3 = np.sign((dy - cy) * (ax - dx) - (dx - cx) * (ay - dy))
+    s4 = np.sign((dy - cy) * (bx - dx) - (dx - cx) * (by - dy))
+    crossed = (s1 != s2) & (s3 != s4)
+
+    rows, lines = np.nonzero(~crossed & ((s1 == 0) | (s2 == 0) | (s3 == 0) | (s4 == 0)))
+    if rows.size:
+        ax, ay, bx, by = ax[rows, 0], ay[rows, 0], bx[rows, 0], by[rows, 0]
+        cx, cy, dx, dy = cx[0, lines], cy[0, lines], dx[0, lines], dy[0, lines]
+
+        def within(x, y, x0, y0, x1, y1):
+            return ((np.minimum(x0, x1) <= x) & (x <= np.maximum(x0, x1)) &
+                    (np.minimum(y0, y1) <= y) & (y <= np.maximum(y0, y1)))
+
+        crossed[rows, lines] = (((s1[rows, lines] == 0) & within(cx, cy, ax, ay, bx, by)) |
+                                ((s2[rows, lines] == 0) & within(dx, dy, ax, ay, bx, by)) |
+                                ((s3[rows, lines] == 0) & within(ax, ay, cx, cy, dx, dy)) |
+                                ((s4[rows, lines] == 0) & within(bx, by, cx, cy, dx, dy)))
+    return np.where(crossed.any(axis=1), crossed.argmax(axis=1), -1)
+
+
+class Terrain:
+    """
+    Ground line preprocessed once per map
+    Holds the landing zone and an index of the ground segments by x column,
+    so a movement only checks the segments below its own x range
+    """
+    COLUMN_WIDTH = 100
+    FORMAT_VERSION = 1  # bump when the preprocessed arrays change, saved terrains get other hashes
+
+    def __init__(self, points, column_width=COLUMN_WIDTH):
+        """
+        :param points: the ground points, as parsed by main.ground_inputs_to_line
+        :param column_width: width of the x columns used to bucket the segments
+        """
+        self.points = points
+        self.xs = np.array([point.x for point in self.points], dtype=np.int64)
+        self.ys = np.array([point.y for point in self.points], dtype=np.int64)
+        self.segments = self.segment_coordinates(self.xs, self.ys)
+        self.landing_zone_index = self.find_landing_zone()
+        # arc_lengths[i] is the length of the ground line from the first point to point i
+        self.arc_lengths = np.zeros(len(self.points))
+        self.arc_lengths[1:] = np.cumsum(np.hypot(np.diff(self.xs), np.diff(self.ys)))
+
+        self.column_width = column_width
+        self.min_x = int(self.xs.min())
+        self.columns = int(self.xs.max() - self.min_x) // column_width + 1
+        # segment ids under each column, in ground order
+        self.buckets = [[] for _ in range(self.columns)]
+        # highest ground point over each column
+        self.envelope = np.full(self.columns, -np.inf)
+        for i in range(len(self.points) - 1):
+            x0, y0, x1, y1 = self.xs[i], self.ys[i], self.xs[i + 1], self.ys[i + 1]
+            for column in range(self.column_of(min(x0, x1)), self.column_of(max(x0, x1)) + 1):
+                self.buckets[column].append(i)
+                self.envelope[column] = max(self.envelope[column],
+                                            self.segment_height(x0, y0, x1, y1, column))
+        # highest ground point over any range of columns, range_max[first, last]
+        self.range_max = np.full((self.columns, self.columns), -np.inf)
+        for first in range(self.columns):
+            self.range_max[first, first:] = np.maximum.accumulate(self.envelope[first:])
+
+    def __len__(self):
+        return len(self.points)
+
+    def __getitem__(self, index):
+        return self.points[index]
+
+    def __iter__(self):
+        return iter(self.points)
+
+    @classmethod
+    def of(cls, ground):
+        """
+        :param ground: a Terrain or a list of ground points
+        :return: the Terrain of the ground
+        """
+        if isinstance(ground, Terrain):
+            return ground
+        return cls(ground)
+
+    @classmethod
+    def map_hash(cls, points, column_width=COLUMN_WIDTH):
+        """
+        :param points: the ground points
+        :return: hex digest identifying the preprocessing of these points
+        """
+        coordinates = np.array([(point.x, point.y) for point in points], dtype=np.int64)
+        digest = blake2b(coordinates.tobytes(), digest_size=16)
+        digest.update(np.array([column_width, cls.FORMAT_VERSION], dtype=np.int64).tobytes())
+        return digest.hexdigest()
+
+    def save(self, path):
+        """
+        Write the preprocessed arrays to a .npz file, Terrain.load reads them back without redoing the work
+        """
+        bucket_sizes = np.array([len(bucket) for bucket in self.buckets], dtype=np.int64)
+        segments = np.array([i for bucket in self.buckets for i in bucket], dtype=np.int64)
+        np.savez(path,
+                 xs=self.xs,
+                 ys=self.ys,
+                 landing_zone_index=-1 if self.landing_zone_index is None else self.landing_zone_index,
+                 arc_lengths=self.arc_lengths,
+                 column_width=self.column_width,
+                 bucket_sizes=bucket_sizes,
+                 segments=segments,
+                 envelope=self.envelope,
+                 range_max=self.range_max)
+
+    @classmethod
+    def load(cls, path, points=None):
+        """
+        :param path: a file written by Terrain.save
+        :param points: the ground points, rebuilt from the saved coordinates when None
+        :return: the Terrain
+        """
+        with np.load(path) as data:
+            terrain = cls.__new__(cls)
+            terrain.xs = data["xs"]
+            terrain.ys = data["ys"]
+            terrain.segments = cls.segment_coordinates(terrain.xs, terrain.ys)
+            if points is None:
+                points = [Vector(int(x), int(y)) for x, y in zip(terrain.xs, terrain.ys)]
+            terrain.points = points
+            landing_zone_index = int(data["landing_zone_index"])
+            terrain.landing_zone_index = None if landing_zone_index < 0 else landing_zone_index
+            terrain.arc_lengths = data["arc_lengths"]
+            terrain.column_width = int(data["column_width"])
+            terrain.min_x = int(terrain.xs.min())
+            terrain.envelope = data["envelope"]
+            terrain.columns = len(terrain.envelope)
+            bucket_sizes = data["bucket_sizes"].tolist()
+            ends = np.cumsum(bucket_sizes).tolist()
+            segments = data["segments"].tolist()
+            terrain.buckets = [segments[end - size:end] for size, end in zip(bucket_sizes, ends)]
+            terrain.range_max = data["range_max"]
+        return terrain
+
+    @staticmethod
+    def segment_coordinates(xs, ys):
+        """
+        :return: (x0, y0, x1, y1) of every ground line, as Python ints
+        """
+        xs, ys = xs.tolist(), ys.tolist()
+        return list(zip(xs[:-1], ys[:-1], xs[1:], ys[1:]))
+
+    def find_landing_zone(self):
+        """
+        Find the [Left point] of the landing zone (the id)
+        """
+        for i in range(1, len(self.points)):
+            if self.points[i - 1].y == self.points[i].y:
+                return i - 1
+        return None
+
+    def distance_to_landing(self, hit_mark, x, y):
+        """
+        Distance along the ground from a hitting point to the landing zone
+        Same results as summing the ground lines one by one, in constant time
+        :param hit_mark: index of the crossed ground line, or -1
+        :param x: x of the last position before the hit
+        :param y: y of the last position before the hit
+        :return: the surface distance
+        """
+        landing_zone_index = self.landing_zone_index
+        if hit_mark > landing_zone_index + 1:
+            # right-hand side
+            corner = self.points[hit_mark]
+            return (self.arc_lengths[hit_mark] - self.arc_lengths[landing_zone_index + 1] +
+                    sqrt((x - corner.x) ** 2 + (y - corner.y) ** 2))
+        if hit_mark < landing_zone_index:
+            # left-hand side
+            corner = self.points[hit_mark + 1]
+            return (self.arc_lengths[landing_zone_index] - self.arc_lengths[hit_mark + 1] +
+                    sqrt((x - corner.x) ** 2 + (y - corner.y) ** 2))
+        return 0
+
+    def distances_to_landing(self, hit_marks, xs, ys):
+        """
+        Array form of distance_to_landing for a whole population
+        :param hit_marks: (n,) int array of crossed ground lines, or -1
+        :param xs: (n,) x of the last positions before the hits
+        :param ys: (n,) y of the last positions before the hits
+        :return: (n,) array of surface distances
+        """
+        landing_zone_index = self.landing_zone_index
+        right = hit_marks > landing_zone_index + 1
+        left = hit_marks < landing_zone_index
+        corners = np.where(right, hit_marks, hit_marks + 1)
+        starts = np.where(right, landing_zone_index + 1, corners)
+        ends = np.where(right, hit_marks, landing_zone_index)
+        corners = np.clip(corners, 0, len(self.points) - 1)
+        distances = (self.arc_lengths[ends] - self.arc_lengths[starts] +
+                     np.sqrt((xs - self.xs[corners]) ** 2 + (ys - self.ys[corners]) ** 2))
+        return np.where(right | left, distances, 0.0)
+
+    def ground_below(self, xs, ys):
+        """
+        Ground line a vertical fall from each point would hit: the highest one under it
+        :param xs: x of the points, a number or an array
+        :param ys: y of the points
+        :return: index of the ground line, -1 where there is none
+        """
+        xs, ys = np.asarray(xs)[..., None], np.asarray(ys)[..., None]
+        x0, y0, x1, y1 = self.xs[:-1], self.ys[:-1], self.xs[1:], self.ys[1:]
+        within = (np.minimum(x0, x1) <= xs) & (xs <= np.maximum(x0, x1))
+        width = np.where(x1 == x0, 1, x1 - x0)
+        heights = np.where(x1 == x0, np.maximum(y0, y1), y0 + (y1 - y0) * (xs - x0) / width)
+        below = within & (heights <= ys)
+        heights = np.where(below, heights, -np.inf)
+        return np.where(below.any(axis=-1), heights.argmax(axis=-1), -1)
+
+    def column_of(self, x):
+        return int(x - self.min_x) // self.column_width
+
+    def column_range(self, x0, x1):
+        """
+        :return: the first and last column under [x0, x1], or None when the range misses the ground
+        """
+        last_column = self.columns - 1
+        first, last = self.column_of(x0), self.column_of(x1)
+        if last < 0 or first > last_column:
+            return None
+        return max(first, 0), min(last, last_column)
+
+    def segment_height(self, x0, y0, x1, y1, column):
+        """
+        Highest point of the segment (x0, y0)-(x1, y1) inside one column
+        """
+        if x0 == x1:
+            return max(y0, y1)
+        left = self.min_x + column * self.column_width
+        right = left + self.column_width
+        slope = (y1 - y0) / (x1 - x0)
+        heights = [y0 + slope * (max(min(x0, x1), left) - x0),
+                   y0 + slope * (min(max(x0, x1), right) - x0)]
+        return max(heights)
+
+    def is_above(self, ax, ay, bx, by):
+        """
+        Check if the segment (ax, ay)-(bx, by) clearly stays above the ground
+        :return: True, if no ground point under the x range of the segment reaches its lowest end
+        """
+        columns = self.column_range(min(ax, bx), max(ax, bx))
+        if columns is None:
+            return True
+        return min(ay, by) > self.range_max[columns]
+
+    def candidates(self, ax, bx):
+        """
+        :return: ids of the ground segments under the x range [ax, bx], in ground order
+        """
+        columns = self.column_range(min(ax, bx), max(ax, bx))
+        if columns is None:
+            return []
+        first, last = columns
+        if first == last:
+            return self.buckets[first]
+        return sorted(set().union(*self.buckets[first:last + 1]))
+
+    def crossing(self, a, b):
+        """
+        Check if a segment (represented by ab) crosses the ground
+        Same results as Vector.is_line_crossing_other over the whole ground
+        :param a: vector a on segment
+        :param b: vector b on segment
+        :return: 0, if intersected with landing ground line
+                 1, if intersected with normal ground lines
+                 2, if not intersected with ground lines
+                 along with the index of the crossed line, or -1
+        """
+        return self.crossing_xy(a.x, a.y, b.x, b.y)
+
+    def crossing_xy(self, ax, ay, bx, by):
+        """
+        Same as crossing, for a segment given by its integer coordinates
+        """
+        if self.is_above(ax, ay, bx, by):
+            return 2, -1
+        segments = self.segments
+        for i in self.candidates(ax, bx):
+            if segments_intersect(ax, ay, bx, by, *segments[i]):
+                if i == self.landing_zone_index:
+                    # reach landing zone
+                    return 0, i
+                # hit ground
+                return 1, i
+        # still flying
+        return 2, -1
+
+    def crossings(self, ax, ay, bx, by):
+        """
+        Array form of crossing for many segments at once, the ones clearly above the ground are skipped
+        :param ax, ay, bx, by: (n,) int arrays, the segments ab to check
+        :return: (n,) array of 0, 1 or 2 as returned by crossing, and (n,) array of the crossed lines, or -1
+        """
+        near = ~self.above_mask(ax, ay, bx, by)
+        marks = np.full(np.shape(ax), -1, dtype=np.int64)
+        if near.any():
+            marks[near] = first_crossings(ax[near], ay[near], bx[near], by[near], self.xs, self.ys)
+        codes = np.where(marks < 0, 2, np.where(marks == self.landing_zone_index, 0, 1))
+        return codes, marks
+
+    def above_mask(self, ax, ay, bx, by):
+        """
+        Array form of is_above for many segments at once
+        :return: (n,) bool array
+        """
+        first = (np.minimum(ax, bx) - self.min_x) // self.column_width
+        last = (np.maximum(ax, bx) - self.min_x) // self.column_width
+        missed = (last < 0) | (first >= self.columns)
+        first = np.clip(first, 0, self.columns - 1)
+        last = np.clip(last, 0, self.columns - 1)
+        return missed | (np.minimum(ay, by) > self.range_max[first, last])
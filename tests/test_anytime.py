@@ -0,0 +1,29 @@
+import time
+
+import numpy as np
+import pytest
+
+from anytime import AnytimeSolver
+from lander import State
+from main import MAPS, parse_map
+from plane import Vector
+
+
+def reachable(command, angle, power):
+    return abs(command.angle - angle) <= 15 and abs(command.power - power) <= 1
+
+
+@pytest.mark.parametrize("angle, power", [(0, 0), (-90, 0), (90, 4), (45, 2)])
+def test_first_command_is_reachable(angle, power):
+    ground_points, map_state = parse_map(MAPS[1])
+    state = State(fuel=map_state.fuel, power=power, angle=angle, speed=map_state.speed,
+                  position=map_state.position, acceleration=Vector(0, 0))
+    for seed in range(5):
+        np.random.seed(seed)
+        solver = AnytimeSolver(ground_points, state, pop_size=40, horizon=40)
+        solver.reset(state)
+        assert (np.abs(solver.genes()[:, 0, 0] - angle) <= 15).all()
+        assert (np.abs(solver.genes()[:, 0, 1] - power) <= 1).all()
+        assert reachable(solver.command(), angle, power)
+        command = solver.think(time.perf_counter() + 0.05)
+        assert reachable(command, angle, power)
@@ -0,0 +1,31 @@
+import numpy as np
+
+from cache import FitnessCache
+from main import MAPS, parse_map
+from population import Population
+
+
+def test_cache_hits_let_their_parents_go():
+    np.random.seed(0)
+    ground_points, init_state = parse_map(MAPS[0])
+    cache = FitnessCache()
+    population = Population(0.01, 60, init_state, ground_points, 60, fitness_cache=cache)
+    for _ in range(15):
+        population.selection()
+        population.reproduction()
+        assert all(lander.chromosome.parent is None for lander in population.population)
+    assert cache.hits
+
+
+def test_cache_hits_keep_the_prune_penalty():
+    np.random.seed(0)
+    ground_points, init_state = parse_map(MAPS[1])
+    cache = FitnessCache()
+    flown = Population(0.08, 60, init_state, ground_points, 60, fitness_cache=cache, prune=True)
+    genes = np.stack([lander.chromosome.genes for lander in flown.population])
+    cached = Population(0.08, 60, init_state, ground_points, 60, fitness_cache=cache, prune=True, genes=genes)
+    assert any(lander.penalty > 0 for lander in flown.population)
+    assert cache.hits >= 60
+    scores = {lander.chromosome.genes.tobytes(): (lander.distance, lander.penalty) for lander in flown.population}
+    for lander in cached.population:
+        assert (lander.distance, lander.penalty) == scores[lander.chromosome.genes.tobytes()]
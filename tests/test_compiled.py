@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+
+import compiled
+from batch import BatchSimulator
+from chromosome import Chromosome, random_genes
+from compiled import CompiledSimulator
+from lander import Lander
+from main import MAPS, parse_map
+from plane import segments_intersect
+from terrain import Terrain
+
+COUNT = 200
+LIFECYCLE = 100
+
+
+@pytest.fixture
+def fallback(monkeypatch):
+    """
+    Fly the kernels as plain Python even when numba is installed
+    """
+    monkeypatch.setattr(compiled, "intersect_kernel", segments_intersect)
+    monkeypatch.setattr(compiled, "first_crossing_kernel", compiled.first_crossing)
+    monkeypatch.setattr(compiled, "reach_limit_kernel", compiled.reach_limit)
+    monkeypatch.setattr(compiled, "fly_rows_kernel", compiled.fly_rows)
+
+
+def check_against_lander_and_batch(map_index, prune):
+    ground_points, init_state = parse_map(MAPS[map_index])
+    terrain = Terrain(ground_points)
+    np.random.seed(map_index)
+    genes = random_genes(COUNT, LIFECYCLE)
+    result = CompiledSimulator(init_state, terrain, LIFECYCLE, prune=prune).simulate(genes)
+    batch = BatchSimulator(init_state, terrain, LIFECYCLE, prune=prune).simulate(genes)
+    for name in ("lengths", "status", "hit_mark", "distance", "fitness", "penalty"):
+        np.testing.assert_array_equal(getattr(result, name), getattr(batch, name), err_msg=name)
+    for row in range(COUNT):
+        lander = Lander(init_state, Chromosome(LIFECYCLE, genes[row]), terrain, LIFECYCLE, keep_trajectory=True,
+                        prune=prune)
+        assert len(lander.trajectory) == result.lengths[row]
+        assert (lander.status.value, lander.hit_mark) == (result.status[row], result.hit_mark[row])
+        assert (lander.distance, lander.fitness) == (result.distance[row], result.fitness[row])
+
+
+@pytest.mark.parametrize("map_index", range(len(MAPS)))
+@pytest.mark.parametrize("prune", [False, True])
+def test_fallback_matches_lander_and_batch(fallback, map_index, prune):
+    check_against_lander_and_batch(map_index, prune)
+
+
+@pytest.mark.skipif(compiled.numba is None, reason="numba is not installed")
+@pytest.mark.parametrize("map_index", range(len(MAPS)))
+@pytest.mark.parametrize("prune", [False, True])
+def test_numba_matches_lander_and_batch(map_index, prune):
+    check_against_lander_and_batch(map_index, prune)
@@ -0,0 +1,33 @@
+import numpy as np
+
+from history import TrajectoryHistory
+
+
+class FakeLander:
+    def __init__(self, length, fitness):
+        self.length = length
+        self.fitness = fitness
+
+    def trajectory_arrays(self):
+        positions = np.full((self.length, 2), self.length)
+        return positions, positions, np.arange(self.length)
+
+
+def test_free_records_do_not_pile_up_when_trajectories_grow():
+    history = TrajectoryHistory(retention="last", keep=2)
+    for generation in range(30):
+        history.record(generation, [FakeLander(10 + generation, 1.0), FakeLander(5, 0.5)])
+        assert len(history.free) <= history.keep
+    assert history.generations() == [28, 29]
+    record = history.load(29)
+    assert record.lengths.tolist() == [39, 5]
+    assert record.trajectories()[0].tolist() == [[39, 39]] * 39
+
+
+def test_free_records_are_reused():
+    history = TrajectoryHistory(retention="last", keep=1)
+    history.record(0, [FakeLander(20, 1.0)])
+    history.record(1, [FakeLander(20, 1.0)])
+    evicted = history.free[0]
+    history.record(2, [FakeLander(15, 1.0)])
+    assert history.load(2) is evicted
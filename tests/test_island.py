@@ -0,0 +1,18 @@
+from threading import Thread
+
+from island import IslandRunner
+from main import MAPS, parse_map
+
+
+def test_migration_larger_than_pipe_buffer():
+    # 120 chromosomes of 200 int16 pairs pickle to about 96KB, more than an OS pipe buffer
+    ground_points, init_state = parse_map(MAPS[1])
+    runner = IslandRunner(init_state, ground_points, islands=2, topology="ring", migration_interval=1, migrants=120,
+                          pop_size=150, max_lifecycle=200)
+    results = []
+    thread = Thread(target=lambda: results.append(runner.run(generations=2)), daemon=True)
+    thread.start()
+    thread.join(timeout=60)
+    assert not thread.is_alive(), "the islands deadlocked on migration"
+    assert results[0] is not None
+    assert results[0].genes.shape == (200, 2)
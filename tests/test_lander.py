@@ -0,0 +1,30 @@
+import numpy as np
+
+from lander import Lander, compute_fitness
+from main import MAPS, parse_map
+from population import Population
+
+
+def test_reading_a_trajectory_keeps_the_scores():
+    np.random.seed(0)
+    ground_points, init_state = parse_map(MAPS[0])
+    first = Population(0.08, 50, init_state, ground_points, 80, vectorized=False)
+    scores = [(lander.status, lander.hit_mark, lander.fitness) for lander in first.population]
+    other_points, other_state = parse_map(MAPS[2])
+    Population(0.08, 50, other_state, other_points, 40, vectorized=False)
+    for lander, score in zip(first.population, scores):
+        assert lander.trajectory[0] is init_state
+        assert (lander.status, lander.hit_mark, lander.fitness) == score
+        assert compute_fitness(lander.calculate_distance(), lander.status) == lander.fitness
+
+
+def test_landers_fly_on_their_own_ground():
+    np.random.seed(0)
+    ground_points, init_state = parse_map(MAPS[0])
+    first = Population(0.08, 20, init_state, ground_points, 80, vectorized=False)
+    other_points, other_state = parse_map(MAPS[2])
+    Population(0.08, 20, other_state, other_points, 40, vectorized=False)
+    for lander in first.population:
+        flown = Lander(init_state, lander.chromosome, first.terrain, 80)
+        assert lander.ground is first.terrain
+        assert (flown.status, flown.hit_mark, flown.fitness) == (lander.status, lander.hit_mark, lander.fitness)
@@ -0,0 +1,22 @@
+import numpy as np
+
+from lander import Lander
+from main import MAPS, parse_map
+from population import Population
+
+
+def test_restart_keeps_the_pool():
+    ground_points, init_state = parse_map(MAPS[1])
+    np.random.seed(0)
+    population = Population(0.08, 40, init_state, ground_points, 60, workers=2)
+    executor = population.evaluator.executor
+    try:
+        state = Lander.compute_next_state(init_state, population.population[0].chromosome.commands()[0])
+        genes = np.stack([lander.chromosome.genes for lander in population.population])
+        population.restart(state, genes)
+        assert population.evaluator.executor is executor
+        serial = Population(0.08, 40, state, ground_points, 60, genes=genes)
+        assert sorted(lander.fitness for lander in population.population) == \
+            sorted(lander.fitness for lander in serial.population)
+    finally:
+        population.close()
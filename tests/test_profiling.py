@@ -0,0 +1,35 @@
+import tracemalloc
+
+import numpy as np
+
+from batch import BatchSimulator
+from chromosome import random_genes
+from main import MAPS, parse_map
+from profiling import PhaseProfiler
+from terrain import Terrain
+
+
+def test_tick_phases_take_no_snapshot(monkeypatch):
+    snapshots = []
+    take_snapshot = tracemalloc.take_snapshot
+
+    def counted_snapshot():
+        snapshots.append(None)
+        return take_snapshot()
+
+    monkeypatch.setattr(tracemalloc, "take_snapshot", counted_snapshot)
+    ground_points, init_state = parse_map(MAPS[1])
+    profiler = PhaseProfiler(trace_allocations=True)
+    try:
+        np.random.seed(0)
+        genes = random_genes(50, 100)
+        BatchSimulator(init_state, Terrain(ground_points), 100, profiler, prune=True).simulate(genes)
+        record = profiler.end_generation(0)
+    finally:
+        tracemalloc.stop()
+    assert record["collision.calls"] > 1
+    assert record["pruning.calls"] > 0
+    assert record["fitness.calls"] == 1
+    # only the fitness phase opens and closes a snapshot
+    assert len(snapshots) == 2
+    assert record["collision.allocated_bytes"] >= 0
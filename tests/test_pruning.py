@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+
+from batch import BatchSimulator
+from chromosome import Chromosome, random_genes
+from lander import FlyState, Lander
+from main import MAPS, parse_map
+from population import Population
+from terrain import Terrain
+
+COUNT = 300
+LIFECYCLE = 150
+
+
+def fly(map_index, prune):
+    ground_points, init_state = parse_map(MAPS[map_index])
+    np.random.seed(map_index)
+    genes = random_genes(COUNT, LIFECYCLE)
+    result = BatchSimulator(init_state, Terrain(ground_points), LIFECYCLE, prune=prune).simulate(genes)
+    return init_state, ground_points, genes, result
+
+
+@pytest.mark.parametrize("map_index", range(len(MAPS)))
+def test_pruning_never_raises_fitness(map_index):
+    _, _, _, full = fly(map_index, prune=False)
+    _, _, _, pruned = fly(map_index, prune=True)
+    cut = pruned.penalty > 0
+    assert np.all(pruned.fitness <= full.fitness)
+    assert not np.any(pruned.status[cut] == FlyState.Landed.value)
+    np.testing.assert_array_equal(pruned.fitness[~cut], full.fitness[~cut])
+
+
+@pytest.mark.parametrize("map_index", range(len(MAPS)))
+@pytest.mark.parametrize("keep_trajectory", [False, True])
+def test_lander_prunes_like_the_batch(map_index, keep_trajectory):
+    init_state, ground_points, genes, result = fly(map_index, prune=True)
+    terrain = Terrain(ground_points)
+    for row in range(0, COUNT, 7):
+        lander = Lander(init_state, Chromosome(LIFECYCLE, genes[row]), terrain, LIFECYCLE,
+                        keep_trajectory=keep_trajectory, prune=True)
+        assert lander.status.value == result.status[row]
+        assert lander.penalty == result.penalty[row]
+        assert lander.fitness == result.fitness[row]
+
+
+def test_prune_belongs_to_each_population():
+    ground_points, init_state = parse_map(MAPS[1])
+    np.random.seed(0)
+    genes = random_genes(60, LIFECYCLE)
+    pruned = Population(0.08, 60, init_state, ground_points, LIFECYCLE, vectorized=False, prune=True, genes=genes)
+    Population(0.08, 60, init_state, ground_points, LIFECYCLE, vectorized=False, prune=False, genes=genes)
+    batch = BatchSimulator(init_state, Terrain(ground_points), LIFECYCLE, prune=True).simulate(genes)
+    assert np.any(batch.penalty > 0)
+    for row, lander in enumerate(pruned.population):
+        assert lander.prune
+        assert lander.fitness == batch.fitness[row]
+        # flown again with its own prune when read
+        assert len(lander.trajectory) == batch.lengths[row]
+    flown = Lander(init_state, pruned.population[0].chromosome, pruned.terrain, LIFECYCLE, prune=pruned.prune)
+    assert flown.fitness == batch.fitness[0]
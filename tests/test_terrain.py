@@ -0,0 +1,40 @@
+import math
+
+import numpy as np
+import pytest
+
+from main import MAPS, parse_map
+from terrain import Terrain
+
+
+def summed_distance(points, landing_zone_index, hit_mark, x, y):
+    """
+    Distance to the landing zone summed over the ground lines one by one, as it was before the arc-length table
+    """
+    if hit_mark > landing_zone_index + 1:
+        lines = range(landing_zone_index + 1, hit_mark)
+        corner = points[hit_mark]
+    elif hit_mark < landing_zone_index:
+        lines = range(hit_mark + 1, landing_zone_index)
+        corner = points[hit_mark + 1]
+    else:
+        return 0
+    distance = 0.0
+    for i in lines:
+        distance += math.hypot(points[i + 1].x - points[i].x, points[i + 1].y - points[i].y)
+    return distance + math.hypot(x - corner.x, y - corner.y)
+
+
+@pytest.mark.parametrize("map_index", range(len(MAPS)))
+def test_distance_to_landing_matches_the_summed_ground(map_index):
+    ground_points, _ = parse_map(MAPS[map_index])
+    terrain = Terrain(ground_points)
+    np.random.seed(map_index)
+    marks = np.arange(-1, len(ground_points) - 1)
+    xs = np.random.uniform(0, 6999, len(marks))
+    ys = np.random.uniform(0, 3000, len(marks))
+    expected = [summed_distance(ground_points, terrain.landing_zone_index, mark, x, y)
+                for mark, x, y in zip(marks.tolist(), xs.tolist(), ys.tolist())]
+    found = [terrain.distance_to_landing(mark, x, y) for mark, x, y in zip(marks.tolist(), xs.tolist(), ys.tolist())]
+    np.testing.assert_allclose(found, expected, rtol=1e-12)
+    np.testing.assert_allclose(terrain.distances_to_landing(marks, xs, ys), expected, rtol=1e-12)